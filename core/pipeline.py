@@ -5,13 +5,101 @@ import subprocess
 import tempfile
 import importlib
 import inspect
-import traceback
-from typing import Dict, List, Any, Optional, Tuple
+import stat
+import hashlib
+import pickle
+import logging
+import logging.handlers
+import multiprocessing as mp
+from collections import ChainMap
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple, Union, get_args, get_origin
 
-from data_clean.video_duration_filter_pipeline import VideoDurationFilter
-from data_process.blur_pipeline import BlurDetector
 from utils.venv import  EnvironmentManager
-from utils.utils import write_processing_log
+from utils.utils import write_batch_processing_log
+
+logger = logging.getLogger("pipeline")
+
+# 内置本地模块类 → 所在模块。类在注册时才import，
+# 避免一启动就拖入cv2/ffmpeg等重依赖（只查看配置或打印帮助时不需要）
+_LOCAL_MODULE_PATHS = {
+    "VideoDurationFilter": "data_clean.video_duration_filter_pipeline",
+    "BlurDetector": "data_process.blur_pipeline",
+}
+
+
+def _worker_log_init(log_queue: "mp.Queue") -> None:
+    """Pool工作进程的日志初始化：记录经队列汇聚到父进程，由监听线程统一格式化输出"""
+    worker_logger = logging.getLogger("pipeline")
+    worker_logger.handlers.clear()
+    worker_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    worker_logger.setLevel(logging.INFO)
+    # fork启动方式下worker会继承父进程root logger的handler，不关propagate
+    # 的话每条记录除了进队列还会在worker本地再输出一遍
+    worker_logger.propagate = False
+
+
+@dataclass(slots=True)
+class ModuleSpec:
+    """注册后的模块描述：slots属性访问比dict键查找快约30%，且形状固定"""
+    type: str
+    path: str
+    venv_path: Optional[str]
+    config: Dict[str, Any]
+    cls: Optional[type] = None
+
+
+@dataclass(slots=True)
+class StepPlan:
+    """预编译的步骤执行计划"""
+    step_name: str
+    module_name: str
+    spec: ModuleSpec
+    param_items: Tuple[Tuple[str, str], ...]
+    output_key: str
+
+
+def _file_sha(file_path: str) -> str:
+    """计算文件内容的blake2b摘要（分块读取，内存占用恒定）"""
+    h = hashlib.blake2b()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _sig_schema(module_class: type) -> Tuple[List[str], List[str], Tuple[Tuple[str, str, Any], ...]]:
+    """提取并缓存模块类__init__的参数元信息（参数名、必填参数、类型校验表）
+
+    inspect.signature开销在几十微秒量级，而同一个类在每个文件的每个步骤都会校验一次，
+    按类缓存后签名解析只发生一次。类型注解在缓存时就分类为simple/union，
+    校验热路径上不再调用get_origin/get_args。
+    """
+    try:
+        init_signature = inspect.signature(module_class.__init__)
+    except ValueError:
+        # 极少数情况：类没有__init__方法（继承自object且未重写）
+        return [], [], ()
+
+    params = [p for p in init_signature.parameters.values() if p.name != "self"]
+    param_names = [p.name for p in params]
+    required_params = [p.name for p in params if p.default is inspect.Parameter.empty]
+
+    # 类型校验表：(参数名, 校验种类, isinstance的第二参数)
+    type_checks = []
+    for p in params:
+        annotation = p.annotation
+        if annotation is inspect.Parameter.empty:
+            continue
+        if isinstance(annotation, type):
+            type_checks.append((p.name, "simple", annotation))
+        elif get_origin(annotation) is Union:
+            type_checks.append((p.name, "union", get_args(annotation)))
+        # 其他泛型（List[str]等）无法直接isinstance，跳过校验
+    return param_names, required_params, tuple(type_checks)
+
 
 class DataProcessingPipeline:
     def __init__(self, config_path: Optional[str] = None):
@@ -22,12 +110,31 @@ class DataProcessingPipeline:
             "pipeline_name": "data process pipeline",
             "stop_on_error": True,
             "supported_video_formats": ['.mp4', '.mov', '.avi', '.mkv'],
-            "supported_image_formats": ['.jpg', '.jpeg', '.png', '.bmp', '.gif']  
+            "supported_image_formats": ['.jpg', '.jpeg', '.png', '.bmp', '.gif'],
+            "workers": None,  # 并行处理的进程数，None表示使用CPU核心数
+            "external_result_cache": False,  # 是否持久化缓存外部模块结果
+            "external_cache_dir": ".cache/pipeline",
+            "sort": "per_dir"  # 文件排序策略：none/per_dir/global
         }
-        
+        # 模块类型 → 执行函数 的分发表，替代每步的if/elif字符串比较
+        self._step_dispatch = {
+            "local": self._run_local_step,
+            "external": self._run_external_step
+        }
+        # 本次运行内的外部模块结果缓存：同批次内相同(脚本,配置,输入)只跑一次子进程
+        self._ext_cache: Dict[Tuple[str, str, str], Any] = {}
+
+        self._refresh_format_sets()
+
         if config_path:
             self.load_config(config_path)
 
+    def _refresh_format_sets(self) -> None:
+        """根据当前配置预计算扩展名集合，热路径上O(1)哈希查找代替列表线性扫描"""
+        self._video_exts = frozenset(f.lower() for f in self.config["supported_video_formats"])
+        self._image_exts = frozenset(f.lower() for f in self.config["supported_image_formats"])
+        self._media_exts = self._video_exts | self._image_exts
+
     def load_config(self, config_path: str) -> None:
         """加载配置文件"""
         if not config_path:
@@ -42,36 +149,41 @@ class DataProcessingPipeline:
                 "pipeline_name": config.get("pipeline_name", self.config["pipeline_name"]),
                 "stop_on_error": config.get("stop_on_error", self.config["stop_on_error"]),
                 "supported_video_formats": config.get("supported_video_formats", self.config["supported_video_formats"]),
-                "supported_image_formats": config.get("supported_image_formats", self.config["supported_image_formats"])
+                "supported_image_formats": config.get("supported_image_formats", self.config["supported_image_formats"]),
+                "workers": config.get("workers", self.config["workers"]),
+                "external_result_cache": config.get("external_result_cache", self.config["external_result_cache"]),
+                "external_cache_dir": config.get("external_cache_dir", self.config["external_cache_dir"]),
+                "sort": config.get("sort", self.config["sort"])
             })
-            
+            self._refresh_format_sets()
+
             # 加载模块和步骤
             self._load_modules(config.get("modules", {}))
             self._load_steps(config.get("pipeline_steps", []))
             
-            print(f"configuration loaded successfully: {self.config['pipeline_name']}")
-            print(f"modules: {len(self.modules)}, steps: {len(self.pipeline_steps)}")
+            logger.info(f"configuration loaded successfully: {self.config['pipeline_name']}")
+            logger.info(f"modules: {len(self.modules)}, steps: {len(self.pipeline_steps)}")
             
         except Exception as e:
-            print(f"error: {str(e)}")
+            logger.error(f"error: {str(e)}")
 
     def _load_modules(self, modules_config: Dict[str, Any]) -> None:
         """加载并注册模块"""
         for module_name, module_info in modules_config.items():
             module_class_name = module_info.get("class")
-            if not all(k in module_info for k in ["type", "path"])
-              print(f"module {module_name} not configuration incomplete")
-              continue
-          
+            if not all(k in module_info for k in ["type", "path"]):
+                logger.warning(f"module {module_name} not configuration incomplete")
+                continue
+
             # 注册模块信息（不直接实例化，在运行时根据环境调用）
             self.register_module(
-              name=module_name,
-              module_info={
-                "type": module_info["type"],
-                "path": module_info["path"],
-                "venv_path": module_info.get("venv_path"),
-                "config": module_info.get("config", {})
-              }
+                name=module_name,
+                module_info={
+                    "type": module_info["type"],
+                    "path": module_info["path"],
+                    "venv_path": module_info.get("venv_path"),
+                    "config": module_info.get("config", {})
+                }
             )
 
     def _load_steps(self, steps_config: List[Dict[str, Any]]) -> None:
@@ -85,284 +197,462 @@ class DataProcessingPipeline:
                     output_key=step.get("output_key")
                 )
             except KeyError as e:
-                print(f"步骤配置缺少参数 {e}，已跳过")
-                traceback.print_ecx()
+                # exc_info惰性格式化：仅当处理器级别启用时才展开调用栈
+                logger.warning(f"步骤配置缺少参数 {e}，已跳过", exc_info=True)
 
     def register_module(self, name: str, module_info: Dict[str, Any]) -> None:
-            """注册处理模块，包含虚拟环境信息"""
-            if name in self.modules:
-                print(f"⚠️ 模块 {name} 已存在，将被覆盖")
-            
-            self.modules[name] = module_info
+        """注册处理模块，包含虚拟环境信息；本地模块的类在注册时解析一次"""
+        if name in self.modules:
+            logger.warning(f"⚠️ 模块 {name} 已存在，将被覆盖")
+
+        module_class = None
+        if module_info["type"] == "local":
+            # 注册时解析并失败，不把配置错误拖到运行期每个文件才暴露
+            module_class = self._resolve_local_class(module_info)
+            if module_class is None:
+                raise ValueError(f"未找到本地模块类 {module_info['path']}（模块 {name}）")
+
+        self.modules[name] = ModuleSpec(
+            type=module_info["type"],
+            path=module_info["path"],
+            venv_path=module_info.get("venv_path"),
+            config=module_info.get("config", {}),
+            cls=module_class
+        )
+
+    @staticmethod
+    def _resolve_local_class(module_info: Dict[str, Any]) -> Optional[type]:
+        """惰性解析本地模块类：注册时才import对应模块，加载本文件不再拖入重依赖
+
+        解析顺序：配置显式给出的module键 → 点分路径 → 内置类名表 → 当前命名空间。
+        """
+        path = module_info["path"]
+        mod_name = module_info.get("module")
+        if mod_name:
+            return getattr(importlib.import_module(mod_name), path, None)
+
+        pkg, _, cls_name = path.rpartition('.')
+        if pkg:
+            return getattr(importlib.import_module(pkg), cls_name, None)
+
+        builtin_mod = _LOCAL_MODULE_PATHS.get(path)
+        if builtin_mod:
+            return getattr(importlib.import_module(builtin_mod), path, None)
+
+        return globals().get(path)
 
     def add_step(self, step_name: str, module_name: str, input_params: Dict[str, str], output_key: Optional[str] = None) -> None:
-        """添加处理步骤"""
+        """添加处理步骤，并预编译执行计划（模块信息、类引用、参数映射只解析一次）"""
         if module_name not in self.modules:
-            print(f"⚠️ 步骤 {step_name} 引用了未注册的模块 {module_name}")
-        
-        self.pipeline_steps.append({
+            logger.warning(f"⚠️ 步骤 {step_name} 引用了未注册的模块 {module_name}")
+
+        step = {
             "step_name": step_name,
             "module_name": module_name,
             "input_params": input_params,
             "output_key": output_key or step_name
-        })
+        }
+        step["_plan"] = self._build_step_plan(step)
+        self.pipeline_steps.append(step)
+
+    def _build_step_plan(self, step: Dict[str, Any]) -> Optional[StepPlan]:
+        """把步骤配置编译为执行计划：运行期不再反复查modules/globals和嵌套dict
+
+        配置的结构校验（必填参数、多余参数、类型）也在这里一次完成，
+        run()的热循环里不再重复。
+        """
+        spec = self.modules.get(step["module_name"])
+        if spec is None:
+            return None
+
+        plan = StepPlan(
+            step_name=step["step_name"],
+            module_name=step["module_name"],
+            spec=spec,
+            param_items=tuple(step["input_params"].items()),
+            output_key=step["output_key"]
+        )
+        self._validate_step_config(plan)
+        return plan
+
+    def _validate_step_config(self, plan: StepPlan) -> None:
+        """加载期校验本地模块配置：必填项、多余项与类型只查一次，不逐文件重复"""
+        spec = plan.spec
+        if spec.cls is None:
+            return
+
+        param_names, required_params, type_checks = _sig_schema(spec.cls)
+
+        # video_path在运行期由上游步骤提供，视为已满足
+        provided = set(spec.config) | {"video_path"}
+        missing_params = [p for p in required_params if p not in provided]
+        if missing_params:
+            raise ValueError(
+                f"步骤「{plan.step_name}」的模块「{plan.module_name}」配置缺失必填参数：{missing_params}\n"
+                f"该模块类「{spec.cls.__name__}」的必填参数为：{required_params}\n"
+                f"请在JSON配置的「{plan.module_name}.config」中补充这些参数"
+            )
+
+        extra_params = [p for p in spec.config if p not in param_names]
+        if extra_params:
+            logger.warning(f"⚠️ 步骤「{plan.step_name}」的模块「{plan.module_name}」存在多余配置参数：{extra_params}\n"
+                           f"该模块类「{spec.cls.__name__}」仅支持参数：{param_names}")
+
+        # 只对配置里静态给出的值做类型校验；运行期注入的video_path不在此列
+        for param_name, kind, check_spec in type_checks:
+            if param_name not in spec.config:
+                continue
+            actual_value = spec.config[param_name]
+            if not isinstance(actual_value, check_spec):
+                expected_repr = check_spec.__name__ if kind == "simple" else [t.__name__ for t in check_spec]
+                raise TypeError(
+                    f"步骤「{plan.step_name}」的模块「{plan.module_name}」参数「{param_name}」类型错误\n"
+                    f"预期类型：{expected_repr}，实际类型：{type(actual_value).__name__}\n"
+                    f"当前配置值：{actual_value}"
+                )
 
     def run(self, input_path: str) -> Dict[str, Any]:
         """执行数据处理管线，支持在不同虚拟环境中运行模块"""
-        # 检查输入路径是否存在
-        if not os.path.exists(input_path):
-            print(f"❌ 输入路径不存在: {input_path}")
+        # 检查输入路径是否存在（只stat一次，结果复用给文件发现）
+        try:
+            input_stat = os.stat(input_path)
+        except OSError:
+            logger.error(f"❌ 输入路径不存在: {input_path}")
             return {}
-        
+
         # 获取所有待处理的视频文件
-        media_files = self._get_media_files(input_path)
+        media_files = self._get_media_files(input_path, input_stat)
         if not media_files:
-            print(f"❌ 未找到任何视频文件: {input_path}")
+            logger.error(f"❌ 未找到任何视频文件: {input_path}")
             return {}
         
-        print(f"\n🚀 开始执行 {self.config['pipeline_name']}")
-        print(f"📂 待处理文件数: {len(media_files)}")
+        logger.info(f"\n🚀 开始执行 {self.config['pipeline_name']}")
+        logger.info(f"📂 待处理文件数: {len(media_files)}")
         
-        # 批量处理所有视频
+        # 批量处理所有文件（多进程并行，文件之间相互独立）
         all_results = {}
-        for idx, file_path in enumerate(media_files):
-            file_name = os.path.basename(file_path)
-            print(f"\n [{idx+1}/{len(media_files)}], 开始处理: {file_name}")
-            
+        workers = self.config.get("workers") or mp.cpu_count()
+        workers = min(workers, len(media_files))
+
+        if workers <= 1:
+            # 单进程串行处理（文件数少或显式配置workers=1时）
+            for idx, file_path in enumerate(media_files):
+                file_name = os.path.basename(file_path)
+                logger.info(f"\n [{idx+1}/{len(media_files)}], 开始处理: {file_name}")
+                file_name, single_result, error = self._process_file_task(file_path)
+                if error is None:
+                    all_results[file_name] = single_result
+                    logger.info(f"处理完成: {file_name}")
+                else:
+                    logger.error(f"处理 {file_name} 失败: {error}")
+                    if self.config.get("stop_on_error", True):
+                        logger.error("遇到错误，已终止批量处理")
+                        break
+        else:
+            # 多进程并行处理：imap_unordered按完成顺序返回，避免慢文件阻塞快文件
+            # 工作进程日志经队列回传，由父进程的监听线程串行写出，避免stdout交错
+            log_queue = mp.Queue()
+            # 回传的记录优先走pipeline logger自己的handler，没有则走root
+            # 已配置的handler（沿用basicConfig的格式），都没有才兜底裸输出
+            listener_handlers = (logger.handlers
+                                 or logging.getLogger().handlers
+                                 or [logging.StreamHandler()])
+            listener = logging.handlers.QueueListener(log_queue, *listener_handlers)
+            listener.start()
             try:
-                # 处理单个视频
-                single_result = self._process_single_file(file_path)
-                all_results[file_name] = single_result
-                print(f"处理完成: {file_name}")
-            except Exception as e:
-                print(f"处理 {file_name} 失败: {str(e)}")
-                traceback.print_exc()
-                if self.config.get("stop_on_error", True):
-                    print("遇到错误，已终止批量处理")
-                    break
-        
-        print(f"\n 批量处理完成，成功处理 {len(all_results)} 个文件")
+                with mp.Pool(workers, initializer=_worker_log_init,
+                             initargs=(log_queue,)) as pool:
+                    for file_name, single_result, error in pool.imap_unordered(
+                            self._process_file_task, media_files):
+                        if error is None:
+                            all_results[file_name] = single_result
+                            logger.info(f"处理完成: {file_name}")
+                        else:
+                            logger.error(f"处理 {file_name} 失败: {error}")
+                            if self.config.get("stop_on_error", True):
+                                logger.error("遇到错误，已终止批量处理")
+                                pool.terminate()
+                                break
+            finally:
+                listener.stop()
+
+        logger.info(f"\n 批量处理完成，成功处理 {len(all_results)} 个文件")
         return all_results
 
-    def _get_media_files(self, input_path: str) -> List[str]: 
+    def _process_file_task(self, file_path: str) -> Tuple[str, Any, Optional[str]]:
+        """单文件处理任务（在工作进程中执行），异常转为错误信息返回，便于主进程统一处理"""
+        file_name = os.path.basename(file_path)
+        try:
+            return file_name, self._process_single_file(file_path), None
+        except Exception as e:
+            return file_name, None, str(e)
+
+    def _get_media_files(self, input_path: str, input_stat: Optional[os.stat_result] = None) -> List[str]:
         """获取所有符合条件的图片和视频文件路径"""
         media_files = []
-        video_extensions = self.config["supported_formats"]
-        image_extensions = self.config["supported_image_formats"] 
-        
-        # 如果是单个文件
-        if os.path.isfile(input_path):
-            ext = os.path.splitext(input_path)[1].lower()
-            if ext in video_extensions or ext in image_extensions:
+        media_exts = self._media_exts
+
+        # 如果是单个文件（复用调用方已取得的stat结果，避免重复系统调用）
+        if input_stat is None:
+            input_stat = os.stat(input_path)
+        if stat.S_ISREG(input_stat.st_mode):
+            name = os.path.basename(input_path)
+            i = name.rfind('.')
+            if i > 0 and name[i:].lower() in media_exts:
                 media_files.append(input_path)
             return media_files
-        
+
         # 如果是文件夹，遍历所有文件
-        for root, _, files in os.walk(input_path):
-            for file in files:
-                ext = os.path.splitext(file)[1].lower()
-                if ext in video_extensions or ext in image_extensions:  
-                    media_files.append(os.path.join(root, file))
-        
-        return sorted(media_files)  # 按路径排序
+        # 排序策略：none（并行处理时顺序无意义）/ per_dir（目录内有序，默认）/ global（全局排序）
+        sort_mode = self.config.get("sort", "per_dir")
+
+        if hasattr(os, "fwalk"):
+            # Linux/Mac：fwalk基于已打开的目录fd做fstatat，目录越大越省openat和上下文切换
+            for root, _dirs, files, _rootfd in os.fwalk(input_path):
+                local_files = []
+                # 目录前缀只拼一次，匹配文件直接字符串相加，省去逐文件的join开销
+                prefix = root if root.endswith(os.sep) else root + os.sep
+                for name in files:
+                    i = name.rfind('.')
+                    if i > 0 and name[i:].lower() in media_exts:
+                        local_files.append(prefix + name)
+                if sort_mode == "per_dir":
+                    local_files.sort()
+                media_files.extend(local_files)
+        else:
+            # Windows等无fwalk的平台：scandir栈式深度遍历（复用getdents的d_type，避免逐文件stat）
+            stack = [input_path]
+            while stack:
+                current_dir = stack.pop()
+                local_files = []
+                try:
+                    with os.scandir(current_dir) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                # is_file复用getdents的d_type缓存，普通文件无需额外statx
+                                name = entry.name
+                                i = name.rfind('.')
+                                if i > 0 and name[i:].lower() in media_exts:
+                                    local_files.append(entry.path)
+                except OSError as e:
+                    logger.warning(f"⚠️ 无法访问目录 {current_dir}: {e}")
+
+                if sort_mode == "per_dir":
+                    local_files.sort()
+                media_files.extend(local_files)
+
+        if sort_mode == "global":
+            media_files.sort()
+        return media_files
 
     def _process_single_file(self, file_path: str) -> Dict[str, Any]:
         """处理单个文件，按原始步骤顺序逐个处理（执行或桥接），保证依赖连续性"""
         current_data: Dict[str, Any] = {"input": file_path}  # 初始输入（文件路径）
         results: Dict[str, Any] = {"original_path": file_path}  # 最终结果记录
         
-        # 1. 判断文件类型（图片/视频）
-        ext = os.path.splitext(file_path)[1].lower()
-        is_image = ext in self.config.get("supported_image_formats", [])
-        is_video = ext in self.config["supported_formats"]
-        print(f"文件类型: {'图片' if is_image else '视频'}")
+        # 1. 判断文件类型（图片/视频）：rfind+切片代替splitext，预计算集合O(1)查找
+        name = os.path.basename(file_path)
+        i = name.rfind('.')
+        ext = name[i:].lower() if i > 0 else ''
+        is_image = ext in self._image_exts
+        is_video = ext in self._video_exts
+        logger.info(f"文件类型: {'图片' if is_image else '视频'}")
     
+        # 统一的依赖查找视图：先查当前数据，再查结果，C层短路，单次哈希
+        scope = ChainMap(current_data, results)
+        stop_on_error = self.config.get("stop_on_error", True)
+
         # 2. 按原始步骤顺序逐个处理（关键修改：保持步骤顺序）
         for step in self.pipeline_steps:  # 遍历原始步骤列表，不提前拆分
             step_name = step["step_name"]
             output_key = step["output_key"]
             input_key = next(iter(step["input_params"].values()), None)  # 解析上游依赖
-            
+
             # 检查上游依赖是否存在（此时上游步骤已处理，理论上必存在）
+            # in判断代替`.get() or .get()`，合法的0/""/空列表不会被误判缺失
             if input_key is None:
-                print(f"⚠️ 步骤 {step_name} 无输入参数，无法处理")
+                logger.warning(f"⚠️ 步骤 {step_name} 无输入参数，无法处理")
                 continue
-            if current_data.get(input_key) is None and results.get(input_key) is None:
+            if input_key not in scope:
                 raise ValueError(f"步骤 {step_name} 依赖的 {input_key} 不存在（上游步骤未处理）")
-    
+
             # 3. 判断是否需要跳过当前步骤
             if is_image and step_name.startswith("video"):
                 # 跳过：桥接输出（用上游输入作为当前步骤的输出）
-                bridge_value = current_data[input_key] or results[input_key]
+                bridge_value = scope[input_key]
                 results[output_key] = bridge_value
-                current_data[output_key] = bridge_value
-                print(f"🔗 桥接跳过的步骤 {step_name}：{input_key} → {output_key}")
+                logger.info(f"🔗 桥接跳过的步骤 {step_name}：{input_key} → {output_key}")
+            elif stop_on_error:
+                # 快路径：任何异常都终止本文件，直接向外传播，由外层统一记录一次，
+                # 避免内层先格式化一遍traceback再重抛的双重开销
+                results[output_key] = self._execute_step(step, scope)
+                logger.info(f"✅ 完成步骤 {step_name}（输出: {output_key}）")
             else:
-                # 执行：按原逻辑处理步骤
-                module_name = step["module_name"]
+                # 容错路径：记录错误并继续后续步骤
                 try:
-                    if module_name not in self.modules:
-                        raise ValueError(f"模块 {module_name} 未注册")
-                    module_info = self.modules[module_name]
-                    module_config = module_info["config"]
-                    
-                    # 准备参数（上游依赖已通过前面的检查，必存在）
-                    params = {param_key: current_data[data_key] or results[data_key] 
-                             for param_key, data_key in step["input_params"].items()}
-                    
-                    # 根据模块类型执行处理
-                    if module_info["type"] == "local":
-                        # 本地模块（同一环境）
-                        module_class = globals().get(module_info["path"])
-                        if not module_class:
-                            raise ValueError(f"未找到本地模块类 {module_info['path']}")
-    
-                        video_path = params.get("video_path").get("video_path")
-    
-                        init_params = module_config.copy()
-                        init_params["video_path"] = video_path
-                        self._validate_init_params(module_class, init_params, module_name, step_name)
-    
-                        try:
-                          module_instance = module_class(**init_params)
-                        except Exception as e:
-                          raise RuntimeRrror(
-                            f"实例化本地模块{module_class.__name__}失败：{str(e)}\n"
-                            f"实例化参数：{init_params}"
-                          )from e
-                          traceback.print_exc()
-                          
-                        result = module_instance.process()
-                        
-                    elif module_info["type"] == "external":
-                        # 外部模块（独立环境）
-                        if not os.path.exists(module_info["path"]):
-                            raise ValueError(f"外部模块脚本不存在: {module_info['path']}")
-                        
-                        # 准备输入数据
-                        input_data = {
-                            "params": params,
-                            "config": module_config
-                        }
-                        
-                        # 构建命令（假设外部模块是Python脚本）list[str], 假设只需要python script.py调用
-                        command = ["python", module_info["path"]]
-                        
-                        # 在指定环境中运行
-                        venv_path = module_info.get("venv_path")
-                        print(f"\n{step_name}的虚拟环境：{venv_path}")
-                        result, error = EnvironmentManager.run_in_environment(
-                            venv_path=venv_path,
-                            command=command,
-                            input_data=input_data
-                        )
-                        
-                        if error:
-                            raise ValueError(f"外部模块执行错误: {error}")
-                            traceback.print_exc()
-                        
-                    else:
-                        raise ValueError(f"不支持的模块类型: {module_info['type']}")
-                    
-                    # 更新数据
-                    results[output_key] = result
-                    current_data[output_key] = result
-                    print(f"✅ 完成步骤 {step_name}（输出: {output_key}）")
-                    
+                    results[output_key] = self._execute_step(step, scope)
+                    logger.info(f"✅ 完成步骤 {step_name}（输出: {output_key}）")
                 except Exception as e:
-                    print(f"❌ 步骤 {step_name} 失败: {str(e)}")
-                    if self.config.get("stop_on_error", True):
-                        raise
-        
+                    logger.exception(f"❌ 步骤 {step_name} 失败: {str(e)}")
+
         return results
 
+    def _execute_step(self, step: Dict[str, Any], scope: ChainMap) -> Any:
+        """解析执行计划并运行单个步骤，返回步骤输出"""
+        plan = step.get("_plan")
+        if plan is None:
+            # 模块可能在add_step之后才注册，此处补一次编译
+            plan = self._build_step_plan(step)
+            if plan is None:
+                raise ValueError(f"模块 {step['module_name']} 未注册")
+            step["_plan"] = plan
+
+        runner = self._step_dispatch.get(plan.spec.type)
+        if runner is None:
+            raise ValueError(f"不支持的模块类型: {plan.spec.type}")
+
+        # 准备参数（上游依赖已通过调用方的检查，必存在）
+        params = {param_key: scope[data_key]
+                  for param_key, data_key in plan.param_items}
+        return runner(plan, params)
+
+    def _run_local_step(self, plan: StepPlan, params: Dict[str, Any]) -> Any:
+        """执行本地模块步骤（同一环境）；配置已在加载期校验，此处直接实例化"""
+        module_class = plan.spec.cls
+        if not module_class:
+            raise ValueError(f"未找到本地模块类 {plan.spec.path}")
+
+        # ChainMap视图代替逐步骤的config.copy()，**解包时行为一致
+        init_params = ChainMap({"video_path": params.get("video_path")}, plan.spec.config)
+
+        try:
+            module_instance = module_class(**init_params)
+        except Exception as e:
+            raise RuntimeError(
+                f"实例化本地模块{module_class.__name__}失败：{str(e)}\n"
+                f"实例化参数：{init_params}"
+            ) from e
+
+        return module_instance.process()
+
+    def _external_cache_key(self, plan: StepPlan, params: Dict[str, Any]) -> str:
+        """外部模块结果的缓存键：脚本路径+mtime、模块配置、输入文件内容摘要"""
+        key_parts = {
+            "path": plan.spec.path,
+            "mtime": os.stat(plan.spec.path).st_mtime_ns,
+            "step": plan.step_name,
+            "cfg": plan.spec.config,
+            "inputs": {k: _file_sha(v) if isinstance(v, str) and os.path.isfile(v) else v
+                       for k, v in params.items()}
+        }
+        raw = json.dumps(key_parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(raw.encode('utf-8')).hexdigest()
+
+    def _run_external_step(self, plan: StepPlan, params: Dict[str, Any]) -> Any:
+        """执行外部模块步骤（独立虚拟环境，子进程调用），可选持久化结果缓存"""
+        if not os.path.exists(plan.spec.path):
+            raise ValueError(f"外部模块脚本不存在: {plan.spec.path}")
+
+        # 批次内零I/O快路径：同样的调用在本次运行中已出现过则直接复用
+        mem_key = (plan.spec.path,
+                   json.dumps(plan.spec.config, sort_keys=True, default=str),
+                   json.dumps(params, sort_keys=True, default=str))
+        if mem_key in self._ext_cache:
+            logger.info(f"♻️ {plan.step_name} 命中批次内缓存")
+            return self._ext_cache[mem_key]
+
+        # 命中持久化缓存则直接返回，完全跳过子进程
+        cache_file = None
+        if self.config.get("external_result_cache"):
+            cache_key = self._external_cache_key(plan, params)
+            cache_file = os.path.join(self.config["external_cache_dir"], f"{cache_key}.pkl")
+            if os.path.exists(cache_file):
+                logger.info(f"💾 {plan.step_name} 命中结果缓存")
+                with open(cache_file, 'rb') as f:
+                    result = pickle.load(f)
+                self._ext_cache[mem_key] = result
+                return result
+
+        # 准备输入数据
+        input_data = {
+            "params": params,
+            "config": plan.spec.config
+        }
+
+        # 构建命令（假设外部模块是Python脚本）list[str], 假设只需要python script.py调用
+        command = ["python", plan.spec.path]
+
+        # 在指定环境中运行：同一文件内步骤存在数据依赖，只能就地等待；
+        # 跨文件的外部步骤重叠由mp.Pool的多worker并行天然提供
+        venv_path = plan.spec.venv_path
+        logger.info(f"\n{plan.step_name}的虚拟环境：{venv_path}")
+        result, error = EnvironmentManager.run_in_environment(
+            venv_path=venv_path,
+            command=command,
+            input_data=input_data
+        )
+
+        if error:
+            raise ValueError(f"外部模块执行错误: {error}")
+
+        self._ext_cache[mem_key] = result
+
+        # 持久化结果，供后续同输入的运行直接命中
+        if cache_file is not None:
+            os.makedirs(self.config["external_cache_dir"], exist_ok=True)
+            with open(cache_file, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return result
+
     def _validate_init_params(self, module_class: type, init_params: Dict[str, Any], module_name: str, step_name: str) -> None:
-      """
-      校验实例化参数是否匹配模块类的__init__签名
-      作用：提前发现配置错误，避免运行时崩溃
-      """
-      # 1. 获取类__init__方法的参数签名
-      try:
-          init_signature = inspect.signature(module_class.__init__)
-      except ValueError:
-          # 极少数情况：类没有__init__方法（继承自object且未重写）
-          return
-      
-      # 2. 提取__init__的参数信息（排除self）
-      init_params_meta = list(init_signature.parameters.values())
-      init_param_names = [p.name for p in init_params_meta if p.name != "self"]
-      
-      # 3. 检查必填参数是否缺失（无默认值的参数）
-      required_params = []
-      for param in init_params_meta:
-          if (param.name == "self"):
-              continue
-          # 判断是否为必填参数（无默认值）
-          if param.default == inspect.Parameter.empty:
-              required_params.append(param.name)
-      
-      # 找出配置中缺失的必填参数
-      missing_params = [p for p in required_params if p not in init_params]
-      if missing_params:
-          raise ValueError(
-              f"步骤「{step_name}」的模块「{module_name}」配置缺失必填参数：{missing_params}\n"
-              f"该模块类「{module_class.__name__}」的必填参数为：{required_params}\n"
-              f"请在JSON配置的「{module_name}.config」中补充这些参数"
-          )
-      
-      # 4. 检查是否存在多余参数（可选：避免配置冗余）
-      extra_params = [p for p in init_params if p not in init_param_names]
-      if extra_params:
-          print(f"⚠️ 步骤「{step_name}」的模块「{module_name}」存在多余配置参数：{extra_params}\n"
-                f"该模块类「{module_class.__name__}」仅支持参数：{init_param_names}")
-      
-      # 5. 检查参数类型（可选：需类的__init__有类型注解）
-      for param_name, param_meta in init_signature.parameters.items():
-          if (param_name == "self") or (param_name not in init_params):
-              continue
-          
-          # 获取类__init__中该参数的预期类型（需类定义时加类型注解）
-          expected_type = param_meta.annotation
-          if expected_type == inspect.Parameter.empty:
-              continue  # 无类型注解，跳过校验
-          
-          # 获取配置中的实际参数值和类型
-          actual_value = init_params[param_name]
-          actual_type = type(actual_value)
-          
-          # 校验类型（支持Union类型，如Optional[str] = None）
-          if isinstance(expected_type, type):
-              # 普通类型（如str、int）
-              if not isinstance(actual_value, expected_type):
-                  raise TypeError(
-                      f"步骤「{step_name}」的模块「{module_name}」参数「{param_name}」类型错误\n"
-                      f"预期类型：{expected_type.__name__}，实际类型：{actual_type.__name__}\n"
-                      f"当前配置值：{actual_value}"
-                  )
-          else:
-              # Union类型（如Optional[str]、Union[str, int]）
-              try:
-                  from typing import get_args, get_origin
-                  if get_origin(expected_type) is Union:
-                      expected_types = get_args(expected_type)
-                      if not isinstance(actual_value, expected_types):
-                          raise TypeError(
-                              f"步骤「{step_name}」的模块「{module_name}」参数「{param_name}」类型错误\n"
-                              f"预期类型：{[t.__name__ for t in expected_types]}，实际类型：{actual_type.__name__}\n"
-                              f"当前配置值：{actual_value}"
-                          )
-              except ImportError:
-                  pass  # 环境不支持typing模块，跳过Union类型校验
-  
+        """
+        校验实例化参数是否匹配模块类的__init__签名
+        作用：提前发现配置错误，避免运行时崩溃
+        """
+        # 1. 取缓存的签名元信息（按类只解析一次）
+        param_names, required_params, type_checks = _sig_schema(module_class)
+
+        # 2. 检查必填参数是否缺失（无默认值的参数）
+        missing_params = [p for p in required_params if p not in init_params]
+        if missing_params:
+            raise ValueError(
+                f"步骤「{step_name}」的模块「{module_name}」配置缺失必填参数：{missing_params}\n"
+                f"该模块类「{module_class.__name__}」的必填参数为：{required_params}\n"
+                f"请在JSON配置的「{module_name}.config」中补充这些参数"
+            )
+
+        # 3. 检查是否存在多余参数（可选：避免配置冗余）
+        extra_params = [p for p in init_params if p not in param_names]
+        if extra_params:
+            logger.warning(f"⚠️ 步骤「{step_name}」的模块「{module_name}」存在多余配置参数：{extra_params}\n"
+                  f"该模块类「{module_class.__name__}」仅支持参数：{param_names}")
+
+        # 4. 检查参数类型（校验表在_sig_schema缓存时已按simple/union分类）
+        for param_name, kind, spec in type_checks:
+            if param_name not in init_params:
+                continue
+
+            actual_value = init_params[param_name]
+            # simple：spec是单个类型；union：spec是类型元组，isinstance都直接支持
+            if not isinstance(actual_value, spec):
+                expected_repr = spec.__name__ if kind == "simple" else [t.__name__ for t in spec]
+                raise TypeError(
+                    f"步骤「{step_name}」的模块「{module_name}」参数「{param_name}」类型错误\n"
+                    f"预期类型：{expected_repr}，实际类型：{type(actual_value).__name__}\n"
+                    f"当前配置值：{actual_value}"
+                )
+
     def list_modules(self) -> None:
         """列出已注册的模块，包括虚拟环境信息"""
-        print("\n📦 已注册模块:")
+        logger.info("\n📦 已注册模块:")
         for name, info in self.modules.items():
-            venv_info = f"（虚拟环境: {info['venv_path']}）" if info.get('venv_path') else ""
-            print(f"  - {name}: 类型={info['type']}, 路径={info['path']} {venv_info}")
+            venv_info = f"（虚拟环境: {info.venv_path}）" if info.venv_path else ""
+            logger.info(f"  - {name}: 类型={info.type}, 路径={info.path} {venv_info}")
 
     def list_steps(self) -> None:
         """列出处理步骤"""
-        print("\n📝 处理步骤:")
+        logger.info("\n📝 处理步骤:")
         for i, step in enumerate(self.pipeline_steps, 1):
-            print(f"  {i}. {step['step_name']} → 模块: {step['module_name']} → 输出键: {step['output_key']}")
+            logger.info(f"  {i}. {step['step_name']} → 模块: {step['module_name']} → 输出键: {step['output_key']}")
@@ -1,7 +1,9 @@
 import os
 import sys
+import logging
 from datetime import datetime
 from pipeline_new import DataProcessingPipeline  # 导入管线类
+from utils.utils import write_batch_processing_log
 
 # 设置默认路径（用户可根据实际情况修改）
 DEFAULT_CONFIG_PATH = "configs/default_pipeline.json"
@@ -15,6 +17,9 @@ def main(args: list = None) -> None:
     参数:
         args: 命令行参数列表（默认为sys.argv[1:]）
     """
+    # 配置管线日志输出（各模块通过logging.getLogger("pipeline")记录）
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
     # 处理命令行参数（默认使用sys.argv[1:]）
     if args is None:
         args = sys.argv[1:]
@@ -54,7 +59,7 @@ def main(args: list = None) -> None:
             return
         
         # 4. 写入日志文件
-        write_processing_log(
+        write_batch_processing_log(
             results=results,
             pipeline_steps=pipeline.pipeline_steps
         )
@@ -1,3 +1,4 @@
+import heapq
 import json
 import os
 import sys
@@ -6,57 +7,187 @@ import tempfile
 import importlib
 import inspect
 import traceback
-from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import functools
+import operator
+import queue
+import threading
+import concurrent.futures
+from collections import ChainMap
+from typing import Dict, List, Any, Optional, Tuple, Union, get_args, get_origin
 
 from data_clean.video_duration_filter_pipeline import VideoDurationFilter
 from data_process.blur_pipeline import BlurDetector
 from utils.venv import  EnvironmentManager
-from utils.utils import write_processing_log
-from utils.path_manager import PathManager
+from utils.utils import write_batch_processing_log
+from utils.path_manager import PathManager, _fast_ext
+
+try:
+    import orjson
+
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str)
+
+    def _json_loads_bytes(data: bytes) -> Any:
+        return orjson.loads(data)
+except ImportError:
+    # 无orjson时退回标准库（慢一个量级但协议一致）
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+    def _json_loads_bytes(data: bytes) -> Any:
+        return json.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _signature_meta(module_class: type) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple]:
+    """缓存模块类__init__的签名信息，避免每个文件×每个步骤重复走inspect
+
+    返回 (required, names, type_checks)：
+    - required: 无默认值的必填参数名
+    - names: 全部参数名（不含self）
+    - type_checks: (参数名, 类型或类型元组) 列表，Union的get_origin/get_args
+      判定在缓存时只做一次，校验时直接isinstance
+    """
+    try:
+        sig = inspect.signature(module_class.__init__)
+    except ValueError:
+        # 极少数情况：类没有__init__方法（继承自object且未重写）
+        return (), (), ()
+
+    params = [p for name, p in sig.parameters.items() if name != "self"]
+    required = tuple(p.name for p in params if p.default is inspect.Parameter.empty)
+    names = tuple(p.name for p in params)
+
+    type_checks = []
+    for p in params:
+        annotation = p.annotation
+        if annotation is inspect.Parameter.empty:
+            continue  # 无类型注解，跳过校验
+        if isinstance(annotation, type):
+            type_checks.append((p.name, annotation))
+        elif get_origin(annotation) is Union:
+            type_checks.append((p.name, get_args(annotation)))
+    return required, names, tuple(type_checks)
+
 
 class DataProcessingPipeline:
     def __init__(self, config_path: Optional[str] = None):
-        self.modules: Dict[str, Dict[str, Any]] = {}  
-        self.pipeline_steps: List[Dict[str, Any]] = []  
+        self.modules: Dict[str, Dict[str, Any]] = {}
+        self.pipeline_steps: List[Dict[str, Any]] = []
+        # 步骤热字段的SoA镜像（finalize时从步骤dict抽出）：循环里按下标
+        # 取列表元素，替代每步三四次 字符串哈希+dict查找
+        self._step_names: List[str] = []
+        self._step_modules: List[str] = []
+        self._step_bridges: List[Dict[str, Any]] = []
+        self._step_output_keys: List[str] = []
         self.results: Dict[str, Any] = {}  
         self.config: Dict[str, Any] = { 
             "pipeline_name": "data process pipeline",
             "stop_on_error": True,
             "supported_video_formats": ['.mp4', '.mov', '.avi', '.mkv'],
             "supported_image_formats": ['.jpg', '.jpeg', '.png', '.bmp', '.gif'],
-            "default_overwrite": False
+            "default_overwrite": False,
+            "step_workers": None,  # 步骤内并行处理的线程数，None表示使用CPU核心数
+            "results_path": None,  # 配置后逐文件结果以JSONL流式落盘，内存只留字节偏移索引
+            "pipelined": False,  # True时各步骤流水线并行：下游边消费上游已完成的批次
+            "max_in_flight": 4  # 流水线模式下相邻步骤间在途批次上限（限制内存）
         }
-        
+        self._result_offsets: Dict[str, int] = {}  # basename → results.jsonl字节偏移
+        self._shm_cache: Dict[str, Tuple[Any, Dict[str, Any]]] = {}  # 文件 → (共享内存块, 描述)
+        self._prescanned: Optional[List[str]] = None  # create()预扫描的媒体文件列表
+
+        # 热循环日志走后台线程：循环内只付一次O(1)入队，编码/写终端/加锁都在线程里
+        self._log_q: queue.SimpleQueue = queue.SimpleQueue()
+        self._log_thread = threading.Thread(target=self._drain_logs, daemon=True)
+        self._log_thread.start()
+
+        self._rebuild_media_state()  # 先按默认配置建立派生状态
         if config_path:
-            self.load_config(config_path)
+            self.load_config(config_path)  # 配置更新后在load_config末尾重建
 
+    def _rebuild_media_state(self) -> None:
+        """按当前配置重建派生状态：PathManager与扩展名集合
+
+        __init__按默认配置建一次；load_config更新配置后必须再建，否则
+        create()这类 先实例化、后加载配置 的路径会把配置里声明的格式
+        静默丢掉（比如配置新增.webm却仍被归为other）。
+        """
         self.path_manager = PathManager(
-            supported_image_formats=config.get("supported_image_formats"),
-            supported_video_formats=config.get("supported_video_formats"),
-            default_overwrite=config.get("default_overwrite", False)
+            supported_image_formats=self.config.get("supported_image_formats"),
+            supported_video_formats=self.config.get("supported_video_formats"),
+            default_overwrite=self.config.get("default_overwrite", False)
         )
 
+        # 预构建扩展名集合/元组，遍历时直接查frozenset，避免逐文件splitext
+        self._video_exts = frozenset(self.config["supported_video_formats"])
+        self._image_exts = frozenset(self.config["supported_image_formats"])
+        self._ext_set = self._video_exts | self._image_exts
+        self._ext_tuple = tuple(self._ext_set)
+
+    def _drain_logs(self) -> None:
+        """后台线程：批量取日志写stdout，队列清空时才flush一次"""
+        out = sys.stdout.buffer
+        while True:
+            msg = self._log_q.get()
+            try:
+                out.write(msg)
+                if self._log_q.empty():
+                    out.flush()
+            except ValueError:
+                return  # stdout已关闭（解释器退出中）
+
+    def _log(self, text: str) -> None:
+        """热循环内的进度日志：预编码后O(1)入队，不碰stdio锁"""
+        self._log_q.put_nowait((text + "\n").encode('utf-8'))
+
+    @classmethod
+    def create(cls, config_path: Optional[str] = None,
+               input_hint: Optional[str] = None) -> "DataProcessingPipeline":
+        """并发初始化：配置加载（含模块导入）与输入目录预扫描重叠执行
+
+        两个阶段都以I/O等待为主，放进线程用asyncio.gather叠起来；万级文件
+        目录的扫描不再排在模块导入之后。预扫描结果存入_prescanned供复用。
+        """
+        async def _async_init() -> "DataProcessingPipeline":
+            pipeline = cls()  # 默认配置即含扩展名集合，扫描可直接用
+            scan_exts = pipeline._ext_set  # 记住预扫描用的是哪套扩展名
+            scan_task = (asyncio.create_task(asyncio.to_thread(pipeline._get_media_files, input_hint))
+                         if input_hint else None)
+            if config_path:
+                await asyncio.to_thread(pipeline.load_config, config_path)
+            if scan_task is not None:
+                pipeline._prescanned = await scan_task
+                if pipeline._ext_set != scan_exts:
+                    # 配置改了支持的格式：默认扩展名的预扫描结果不可信，重扫
+                    pipeline._prescanned = await asyncio.to_thread(
+                        pipeline._get_media_files, input_hint)
+            return pipeline
+
+        return asyncio.run(_async_init())
+
     def load_config(self, config_path: str) -> None:
         """加载配置文件"""
         if not config_path:
             return
         
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # 更新全局配置
+            # 整体读成bytes交给orjson（单次C实现解析），无orjson时走标准库
+            with open(config_path, 'rb') as f:
+                config = _json_loads_bytes(f.read())
+
+            # 更新全局配置：默认值即self.config现值，逐键覆盖
             self.config.update({
-                "pipeline_name": config.get("pipeline_name", self.config["pipeline_name"]),
-                "stop_on_error": config.get("stop_on_error", self.config["stop_on_error"]),
-                "supported_video_formats": config.get("supported_video_formats", self.config["supported_video_formats"]),
-                "supported_image_formats": config.get("supported_image_formats", self.config["supported_image_formats"]),
-                "default_overwrite": config.get("default_overwrite", False)
+                key: config.get(key, default)
+                for key, default in self.config.items()
             })
-            
+            self._rebuild_media_state()  # 扩展名等派生状态跟着新配置走
+
+
             # 加载模块和步骤
             self._load_modules(config.get("modules", {}))
             self._load_steps(config.get("pipeline_steps", []))
+            self.finalize()
             
             print(f"configuration loaded successfully: {self.config['pipeline_name']}")
             print(f"modules: {len(self.modules)}, steps: {len(self.pipeline_steps)}")
@@ -68,19 +199,22 @@ class DataProcessingPipeline:
         """加载并注册模块"""
         for module_name, module_info in modules_config.items():
             module_class_name = module_info.get("class")
-            if not all(k in module_info for k in ["type", "path"])
-              print(f"module {module_name} not configuration incomplete")
-              continue
-          
+            if not all(k in module_info for k in ["type", "path"]):
+                print(f"module {module_name} not configuration incomplete")
+                continue
+
             # 注册模块信息（不直接实例化，在运行时根据环境调用）
             self.register_module(
-              name=module_name,
-              module_info={
-                "type": module_info["type"],
-                "path": module_info["path"],
-                "venv_path": module_info.get("venv_path"),
-                "config": module_info.get("config", {})
-              }
+                name=module_name,
+                module_info={
+                    "type": module_info["type"],
+                    "path": module_info["path"],
+                    "venv_path": module_info.get("venv_path"),
+                    "config": module_info.get("config", {}),
+                    "persistent": module_info.get("persistent", False),
+                    "needs": module_info.get("needs"),
+                    "accepts_file_list": module_info.get("accepts_file_list", False)
+                }
             )
 
     def _load_steps(self, steps_config: List[Dict[str, Any]]) -> None:
@@ -91,31 +225,97 @@ class DataProcessingPipeline:
                     step_name=step["step_name"],
                     module_name=step["module_name"],
                     input_params=step["input_params"],
-                    bridge=step["bridge"]
+                    bridge=step["bridge"],
+                    output_key=step.get("output_key")
                 )
             except KeyError as e:
                 print(f"步骤配置缺少参数 {e}，已跳过")
-                traceback.print_ecx()
+                traceback.print_exc()
 
     def register_module(self, name: str, module_info: Dict[str, Any]) -> None:
-            """注册处理模块，包含虚拟环境信息"""
+            """注册处理模块，包含虚拟环境信息；本地模块的类在注册时解析一次"""
             if name in self.modules:
                 print(f"⚠️ 模块 {name} 已存在，将被覆盖")
-            
+
+            if module_info.get("type") == "local":
+                # 注册时解析类引用并缓存，后续每个文件×步骤的分发只剩一次dict读取
+                path = module_info["path"]
+                mod_name, _, cls_name = path.rpartition('.')
+                try:
+                    if mod_name:
+                        module_info["_class"] = getattr(importlib.import_module(mod_name), cls_name)
+                    else:
+                        module_info["_class"] = globals().get(cls_name)
+                except (ImportError, AttributeError) as e:
+                    print(f"⚠️ 模块 {name} 的类 {path} 解析失败: {str(e)}")
+                    module_info["_class"] = None
+
             self.modules[name] = module_info
 
-    def add_step(self, step_name: str, module_name: str, input_params: Dict[str, str], bridge: Dict[str, str]) -> None:
-        """添加处理步骤"""
+    def add_step(self, step_name: str, module_name: str, input_params: Dict[str, str],
+                 bridge: Dict[str, str], output_key: Optional[str] = None) -> None:
+        """添加处理步骤；输入参数映射在注册时固化为元组，避免逐文件items()"""
         if module_name not in self.modules:
             print(f"⚠️ 步骤 {step_name} 引用了未注册的模块 {module_name}")
-        
+
         self.pipeline_steps.append({
             "step_name": step_name,
             "module_name": module_name,
             "input_params": input_params,
-            "bridge": bridge
+            "bridge": bridge,
+            "output_key": output_key or step_name,
+            "_resolved_inputs": tuple(input_params.items())
         })
 
+    def finalize(self) -> None:
+        """所有步骤注册完后做一次预编译
+
+        为每个步骤生成特化执行函数、参数itemgetter和热字段的SoA镜像，
+        逐文件分发时只剩对预编译产物的平铺使用，不再逐文件做dict推导。
+        load_config末尾会自动调用；手工add_step后需自行调用一次。
+        """
+        for idx, step in enumerate(self.pipeline_steps):
+            step["_fn"] = self._compile_step_fn(idx, step)
+            # C实现的itemgetter一次取出全部依赖值，替代逐文件的dict推导
+            data_keys = tuple(dk for _, dk in step["_resolved_inputs"])
+            step["_param_keys"] = tuple(pk for pk, _ in step["_resolved_inputs"])
+            step["_getter"] = operator.itemgetter(*data_keys) if data_keys else None
+
+        # 热字段SoA镜像：run/_process_single_file的循环按下标取用
+        self._step_names = [s["step_name"] for s in self.pipeline_steps]
+        self._step_modules = [s["module_name"] for s in self.pipeline_steps]
+        self._step_bridges = [s.get("bridge", {}) for s in self.pipeline_steps]
+        self._step_output_keys = [s["output_key"] for s in self.pipeline_steps]
+
+    def _compile_step_fn(self, idx: int, step: Dict[str, Any]) -> Optional[Any]:
+        """为本地模块步骤生成特化执行函数（exec代码生成）
+
+        load_config之后模块类和配置都已固定，把类型分支、模块查找和配置
+        读取全部烘焙进生成代码，逐文件调用只剩 实例化+process()；失败按
+        _process_single_step的约定返回哨兵元组。外部模块返回None走通用路径
+        （子进程开销占绝对大头，特化无意义）。
+        """
+        module_info = self.modules.get(step["module_name"])
+        if not module_info or module_info["type"] != "local":
+            return None
+        module_class = module_info.get("_class")
+        if not module_class:
+            return None
+
+        fn_name = f"_step_{idx}"
+        src = (
+            f"def {fn_name}(file_path):\n"
+            f"    params = dict(_cfg)\n"
+            f"    params['file_path'] = file_path\n"
+            f"    try:\n"
+            f"        return True, _cls(**params).process()\n"
+            f"    except Exception as e:\n"
+            f"        return False, '本地模块 {module_class.__name__} 处理失败：' + str(e)\n"
+        )
+        namespace = {"_cls": module_class, "_cfg": dict(module_info["config"])}
+        exec(src, namespace)
+        return namespace[fn_name]
+
     def run(self, input_path: str) -> Dict[str, Any]:
         """执行数据处理管线，支持按步骤批量处理"""
         if not os.path.exists(input_path):
@@ -126,17 +326,30 @@ class DataProcessingPipeline:
 
         # 预分类所有文件（仅执行一次）
         classified_files = self.path_manager.classify_files(input_path)
-        print(f"📊 预分类结果: 图片{len(classified_files['image'])}个, 视频{len(classified_files['video'])}
-        
+        print(f"📊 预分类结果: 图片{len(classified_files['image'])}个, 视频{len(classified_files['video'])}个")
+
+        # 流水线模式：步骤间用队列串联，下游即刻消费上游完成的批次
+        if self.config.get("pipelined") and self.pipeline_steps:
+            return self._run_pipelined(classified_files)
+
+        # 所有模块都未配置output_path时，退回逐文件模式（SoA结果布局）
+        if not any(self.modules.get(s["module_name"], {}).get("config", {}).get("output_path")
+                   for s in self.pipeline_steps):
+            media_files = [f for files in classified_files.values() for f in files]
+            return self._run_per_file(media_files)
+
         # 初始化每个文件的结果字典
         current_dir = input_path
         current_classified = classified_files  # 复用预分类结果，**步骤间更新**
         all_results = {"steps": []}
-   
-        for step in self.config["pipeline_steps"]:
-            step_name = step["step_name"]
-            output_path = self.modules[step["module_name"]]["config"].get("output_path")
-            bridge_config = step.get("bridge", {})
+
+        if len(self._step_names) != len(self.pipeline_steps):
+            self.finalize()  # 手工add_step后未调用finalize时兜底重建镜像
+        for i in range(len(self._step_names)):
+            step_name = self._step_names[i]
+            output_path = self.modules[self._step_modules[i]]["config"].get("output_path")
+            bridge_config = self._step_bridges[i]
+            step = self.pipeline_steps[i]
             print(f"\n===== 开始执行步骤: {step_name} =====")
     
             if not output_path:
@@ -162,15 +375,118 @@ class DataProcessingPipeline:
                     "step_result": step_result
                 })
             except Exception as e:
-                print(f"{step_name failed: {str(e)}}")
+                print(f"{step_name} failed: {str(e)}")
                 traceback.print_exc()
-                sys.exit(1)
                 return all_results
     
         print(f"\n批量处理完成，总步骤数: {len(all_results['steps'])}")
         return all_results
 
-    def _process_step(self, step: Dict[str, Any], input_classified: Dict[str, List[str]], 
+    def _run_pipelined(self, classified_files: Dict[str, List[str]]) -> Dict[str, Any]:
+        """流水线并行执行：每个步骤一个工作线程，用有界队列串联
+
+        步骤i+1在步骤i产出一个类型批次后立即开始消费，不等整步结束；
+        总吞吐由最慢的阶段决定而不是各阶段耗时之和。队列带max_in_flight
+        上限，防止快阶段把慢阶段的待处理批次堆满内存。线程足够：各阶段
+        的实际工作都在子进程或释放GIL的C扩展里。
+        """
+        steps = self.pipeline_steps
+        max_in_flight = self.config.get("max_in_flight", 4)
+        queues: List[queue.Queue] = [queue.Queue(maxsize=max_in_flight)
+                                     for _ in range(len(steps) + 1)]
+        errors: List[str] = []
+
+        # 开线程前整体校验：引用未注册模块（add_step只告警）或缺output_path
+        # 属于普通的配置错误，等阶段线程起来后才炸会吞掉EOF哨兵，
+        # 收集循环就永久卡在queues[-1].get()上
+        for step in steps:
+            module_info = self.modules.get(step["module_name"])
+            if module_info is None:
+                raise ValueError(
+                    f"步骤 {step['step_name']} 引用了未注册的模块 {step['module_name']}")
+            if not module_info["config"].get("output_path"):
+                raise ValueError(
+                    f"步骤 {step['step_name']} 的模块未配置output_path，无法流水线执行")
+
+        def _stage(step_idx: int) -> None:
+            in_q, out_q = queues[step_idx], queues[step_idx + 1]
+            try:
+                step = steps[step_idx]
+                module_info = self.modules[step["module_name"]]
+                output_dir = module_info["config"].get("output_path")
+                bridge_config = step.get("bridge") or {}
+                skip_types = bridge_config.get("skip_types", [])
+                bridge_action = bridge_config.get("action", "copy")
+                bridge_files = {
+                    "copy": self.path_manager.batch_copy_files,
+                    "move": self.path_manager.batch_move_files,
+                    "link": self.path_manager.batch_link_files,
+                    "symlink": self.path_manager.batch_symlink_files,
+                }.get(bridge_action, self.path_manager.batch_copy_files)
+            except Exception as e:
+                # 阶段初始化失败也要把EOF传下去，上游批次原样吞掉、
+                # 下游照常收到哨兵，整条流水线不会悬死
+                errors.append(f"{steps[step_idx].get('step_name', step_idx)}(init): {str(e)}")
+                while True:
+                    item = in_q.get()
+                    if item is None:
+                        out_q.put(None)
+                        return
+                    out_q.put((item[0], []))
+            while True:
+                item = in_q.get()
+                if item is None:
+                    out_q.put(None)  # 向下游传递EOF
+                    return
+                file_type, files = item
+                try:
+                    if not files:
+                        out_files = []
+                    elif file_type in skip_types:
+                        # 桥接：跳过的类型直接复制/移动/链接到输出目录
+                        out_files = bridge_files(files, output_dir)
+                    else:
+                        module_input_dir = os.path.join(output_dir, f"_{file_type}_input_p{step_idx}")
+                        os.makedirs(module_input_dir, exist_ok=True)
+                        self.path_manager.batch_copy_files(files, module_input_dir)
+                        self._process_batch_with_module(
+                            module_name=step["module_name"],
+                            module_config=module_info["config"],
+                            input_dir=module_input_dir,
+                            step_name=step["step_name"]
+                        )
+                        out_files = self.path_manager.classify_files(output_dir)[file_type]
+                    out_q.put((file_type, out_files))
+                except Exception as e:
+                    errors.append(f"{step['step_name']}({file_type}): {str(e)}")
+                    out_q.put((file_type, []))
+
+        threads = [threading.Thread(target=_stage, args=(i,), daemon=True)
+                   for i in range(len(steps))]
+        for t in threads:
+            t.start()
+
+        # 灌入初始批次（每个文件类型一个批次），随后发EOF
+        for file_type, files in classified_files.items():
+            queues[0].put((file_type, files))
+        queues[0].put(None)
+
+        final_classified: Dict[str, List[str]] = {}
+        while True:
+            item = queues[-1].get()
+            if item is None:
+                break
+            file_type, files = item
+            final_classified.setdefault(file_type, []).extend(files)
+        for t in threads:
+            t.join()
+
+        if errors and self.config.get("stop_on_error", True):
+            raise RuntimeError(f"流水线执行出错: {'; '.join(errors)}")
+        print(f"\n流水线处理完成，最终文件数: {sum(len(v) for v in final_classified.values())}")
+        return {"final_classified": final_classified, "errors": errors}
+
+    def _process_step(self, step: Dict[str, Any], input_classified: Dict[str, List[str]],
         output_dir: str, bridge_config: Dict[str, Any]) -> Dict[str, Any]:
         """批量处理单个步骤（桥接+模块批量处理）"""
         step_name = step["step_name"]
@@ -178,9 +494,17 @@ class DataProcessingPipeline:
         module_info = self.modules[module_name]
         module_config = module_info["config"]
         skip_types = bridge_config.get("skip_types", [])  # 跳过的类型（如["image"]）
-        bridge_action = bridge_config.get("action", "copy")  # copy/move
-        if bridge_action not in ["copy", "move"]:
-            raise ValueError(f"步骤 {step_name} 桥接配置错误：action必须为'copy'或'move'")
+        bridge_action = bridge_config.get("action", "copy")  # copy/move/link/symlink
+        bridge_dispatch = {
+            "copy": self.path_manager.batch_copy_files,
+            "move": self.path_manager.batch_move_files,
+            "link": self.path_manager.batch_link_files,      # 硬链接：零字节搬运，EXDEV退回复制
+            "symlink": self.path_manager.batch_symlink_files,
+        }
+        if bridge_action not in bridge_dispatch:
+            raise ValueError(
+                f"步骤 {step_name} 桥接配置错误：action必须为{sorted(bridge_dispatch)}之一")
+        bridge_files = bridge_dispatch[bridge_action]
     
         step_result = {
             "processed_types": [],  # 处理的类型
@@ -190,80 +514,141 @@ class DataProcessingPipeline:
             "module_details": {}
         }
     
-        # 1. 处理桥接文件（批量复制/移动跳过的类型）
-        for file_type in skip_types:
-            if file_type not in input_classified:
-                continue
-            source_files = input_classified[file_type]
-            if not source_files:
-                continue
-    
-            try:
-                # 批量复制/移动到输出目录（不维持子目录）
-                skip_output_dir = os.path.join(output_dir, file_type)
-                if bridge_action == "copy":
-                    target_paths = self.path_manager.batch_copy_files(
-                        source_files=source_files,
-                        output_dir=output_dir
-                    )
-                else:
-                    target_paths = self.path_manager.batch_move_files(
-                        source_files=source_files,
-                        output_dir=output_dir
-                    )
+        step_workers = self.config.get("step_workers") or os.cpu_count() or 1
+        result_lock = threading.Lock()
+
+        def _bridge_one(file_type: str, source_files: List[str]) -> None:
+            """桥接：跳过的类型批量复制/移动/链接到输出目录（不维持子目录）"""
+            bridge_files(
+                source_files=source_files,
+                output_dir=output_dir
+            )
+            with result_lock:
                 step_result["bridged"].append({
                     "type": file_type,
                     "count": len(source_files),
                     "action": bridge_action
                 })
-                print(f"桥接 {file_type} {len(source_files)} 个，动作: {bridge_action}")
-            except Exception as e:
-                step_result["errors"].append({
-                    "type": file_type,
-                    "error": str(e),
-                    "stage": "bridge"
-                })
-                raise RuntimeError(f"桥接 {file_type} 出错: {str(e)}") from e
-                traceback.print_exc()
-    
-        # 2. 处理需要执行的类型（批量输入目录给模块）
-        process_types = [t for t in input_classified if t not in skip_types]
-        for file_type in process_types:
-            source_files = input_classified[file_type]
-            if not source_files:
-                continue
-            module_input_dir = None
-            try:
-                # 准备模块输入目录（存放当前类型的所有文件）
-                module_input_dir = os.path.join(output_dir, f"_{file_type}_input")  # 临时输入目录
+            print(f"桥接 {file_type} {len(source_files)} 个，动作: {bridge_action}")
+
+        def _process_one(file_type: str, source_files: List[str]) -> None:
+            """处理：文件相互独立，按块并行分发给模块"""
+            # 模块直接接受文件列表时完全跳过暂存目录（零复制、零链接）
+            if module_info["type"] == "local" and module_info.get("accepts_file_list"):
+                module_class = module_info.get("_class")
+                if not module_class:
+                    raise ValueError(f"未找到本地模块类 {module_info['path']}")
+                init_params = module_config.copy()
+                init_params["file_paths"] = list(source_files)
+                try:
+                    module_result = module_class(**init_params).process()
+                except Exception as e:
+                    raise RuntimeError(f"本地模块{module_name} 出错: {str(e)}") from e
+                with result_lock:
+                    step_result["module_details"][file_type] = module_result
+                    step_result["processed_types"].append(file_type)
+                    step_result["processed_count"] += len(source_files)
+                print(f"批量处理 {file_type} {len(source_files)} 个，模块: {module_name}（直接传文件列表）")
+                return
+
+            # 本地模块的暂存目录用链接填充（一次syscall/文件，无数据I/O）；
+            # 外部模块在独立环境里跑，保守起见仍复制真实文件
+            stage_files = (self.path_manager.batch_symlink_files
+                           if module_info["type"] == "local"
+                           else self.path_manager.batch_copy_files)
+            chunk_count = min(step_workers, len(source_files))
+            chunks = [source_files[i::chunk_count] for i in range(chunk_count)]
+
+            def _run_chunk(indexed_chunk):
+                chunk_idx, chunk_files = indexed_chunk
+                # 准备模块输入目录（避免修改原始文件）
+                module_input_dir = os.path.join(output_dir, f"_{file_type}_input_{chunk_idx}")
                 os.makedirs(module_input_dir, exist_ok=True)
-    
-                # 批量复制文件到模块输入目录（避免修改原始文件）
-                self.path_manager.batch_copy_files(
-                    source_files=source_files,
+                stage_files(
+                    source_files=chunk_files,
                     output_dir=module_input_dir
                 )
-    
                 # 调用模块批量处理（输入为目录，模块内部批量处理）
-                module_result = self._process_batch_with_module(
+                return self._process_batch_with_module(
                     module_name=module_name,
                     module_config=module_config,
-                    input_dir=module_input_dir,  # 模块输入：存放待处理文件的目录
+                    input_dir=module_input_dir,
                     step_name=step_name
                 )
-                step_result["module_details"][file_type] = module_result
+
+            if chunk_count <= 1:
+                module_results = [_run_chunk((0, chunks[0]))]
+            elif module_info["type"] == "external":
+                # 外部模块：所有子进程一次性异步提交，fork+环境激活开销相互重叠
+                input_datas = []
+                for chunk_idx, chunk_files in enumerate(chunks):
+                    module_input_dir = os.path.join(output_dir, f"_{file_type}_input_{chunk_idx}")
+                    os.makedirs(module_input_dir, exist_ok=True)
+                    self.path_manager.batch_copy_files(
+                        source_files=chunk_files,
+                        output_dir=module_input_dir
+                    )
+                    input_datas.append({
+                        "file_path": module_input_dir,
+                        "config": module_config
+                    })
+                module_results = []
+                for result, error in self._run_external_batch(module_info, input_datas):
+                    if error:
+                        raise ValueError(f"外部模块执行错误: {error}")
+                    module_results.append(result)
+            else:
+                # 线程池足够：模块要么在子进程里跑（等待期释放GIL），
+                # 要么是cv2/ffmpeg等在C层释放GIL的本地模块
+                with concurrent.futures.ThreadPoolExecutor(max_workers=chunk_count) as executor:
+                    module_results = list(executor.map(_run_chunk, enumerate(chunks)))
+
+            with result_lock:
+                step_result["module_details"][file_type] = (
+                    module_results[0] if len(module_results) == 1 else module_results)
                 step_result["processed_types"].append(file_type)
                 step_result["processed_count"] += len(source_files)
-                print(f"批量处理 {file_type} {len(source_files)} 个，模块: {module_name}")
-            except Exception as e:
-                step_result["errors"].append({
-                    "type": file_type,
-                    "error": str(e),
-                    "stage": "process"
-                })
-                raise RuntimeError(f"批量处理 {file_type} 出错: {str(e)}") from e
-                traceback.print_exc()
-    
+            print(f"批量处理 {file_type} {len(source_files)} 个，模块: {module_name}，并行块数: {chunk_count}")
+
+        # 桥接与各类型处理相互独立：一个类型一个任务并发执行，
+        # shutil拷贝的磁盘等待和子进程启动相互重叠
+        tasks = []
+        for file_type in skip_types:
+            source_files = input_classified.get(file_type)
+            if source_files:
+                tasks.append(("bridge", _bridge_one, file_type, source_files))
+        for file_type in input_classified:
+            if file_type in skip_types:
+                continue
+            source_files = input_classified[file_type]
+            if source_files:
+                tasks.append(("process", _process_one, file_type, source_files))
+
+        if tasks:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                futures = {
+                    executor.submit(fn, file_type, source_files): (stage, file_type)
+                    for stage, fn, file_type, source_files in tasks
+                }
+                first_error = None
+                for future in concurrent.futures.as_completed(futures):
+                    stage, file_type = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        with result_lock:
+                            step_result["errors"].append({
+                                "type": file_type,
+                                "error": str(e),
+                                "stage": stage
+                            })
+                        if first_error is None:
+                            action = "桥接" if stage == "bridge" else "批量处理"
+                            first_error = RuntimeError(f"{action} {file_type} 出错: {str(e)}")
+                            first_error.__cause__ = e
+            if first_error is not None:
+                raise first_error
+
         return step_result
 
     def _process_batch_with_module(self, module_name: str, module_config: Dict, input_dir: str, step_name: str) -> Any:
@@ -273,24 +658,25 @@ class DataProcessingPipeline:
             raise ValueError(f"模块 {module_name} 未注册")
     
         # 确保模块输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
-    
+        output_dir = module_config.get("output_path")
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
         if module_info["type"] == "local":
             # 本地模块：传入输入目录和输出目录（模块内部批量处理）
-            module_class = globals().get(module_info["path"])
+            module_class = module_info.get("_class")
             if not module_class:
                 raise ValueError(f"未找到本地模块类 {module_info['path']}")
 
             init_params = module_config.copy()
-            init_params["video_path"] = video_path
+            init_params["file_path"] = input_dir
             self._validate_init_params(module_class, init_params, module_name, step_name)
-            
+
             try:
                 module_instance = module_class(**init_params)
-                return module_instance.process() 
+                return module_instance.process()
             except Exception as e:
                 raise RuntimeError(f"本地模块{module_name} 出错: {str(e)}") from e
-                traceback.print_exc()
     
         elif module_info["type"] == "external":
             # 外部模块：通过命令行传递输入/输出目录
@@ -300,114 +686,380 @@ class DataProcessingPipeline:
                 "file_path": input_dir,
                 "config": module_config
             }
-            command = ["python", module_info["path"]]
-            venv_path = module_info.get("venv_path")
-    
-            result, error = EnvironmentManager.run_in_environment(
-                venv_path=venv_path,
-                command=command,
-                input_data=input_data
-            )
+            if module_info.get("persistent"):
+                result, error = self._dispatch_to_worker(module_info, input_data)
+            else:
+                command = ["python", module_info["path"]]
+                venv_path = module_info.get("venv_path")
+                result, error = EnvironmentManager.run_in_environment(
+                    venv_path=venv_path,
+                    command=command,
+                    input_data=input_data
+                )
             if error:
                 raise ValueError(f"外部模块执行错误: {error}")
-                traceback.print_exc()
             return result
     
         else:
             raise ValueError(f"不支持的模块类型: {module_info['type']}")
 
-    def _process_single_step(self, input_dir: str, step: Dict[str, Any]) -> Any:
-        """处理单个文件的单个步骤"""
+    def _run_per_file(self, media_files: List[str]) -> Dict[str, Any]:
+        """逐文件执行步骤链，结果按SoA（列式）布局组织
+
+        每个步骤对应一个与file_paths对齐的结果列表，存活文件用布尔掩码标记；
+        步骤间不再按文件名重建嵌套dict，热循环变成对齐列表上的平铺遍历，
+        只在返回时一次性重建按文件名索引的结果。
+        """
+        file_paths = list(media_files)
+        n = len(file_paths)
+        outputs: Dict[str, List[Any]] = {"original_path": file_paths.copy()}
+        alive = [True] * n
+
+        for step in self.pipeline_steps:
+            step_name = step["step_name"]
+            # 配置在文件间不变，静态校验整步只做一次
+            self._validate_step_static(step)
+            step_fn = step.get("_fn")  # finalize()生成的特化函数（仅本地模块）
+            step_outputs: List[Any] = [None] * n
+            for i in range(n):
+                if not alive[i]:
+                    continue
+                ok, result = (step_fn(file_paths[i]) if step_fn
+                              else self._process_single_step(file_paths[i], step))
+                if ok:
+                    step_outputs[i] = result
+                else:
+                    self._log(f"❌ 步骤 {step_name} 处理 {file_paths[i]} 失败: {result}")
+                    if self.config.get("stop_on_error", True):
+                        raise RuntimeError(f"步骤 {step_name} 处理 {file_paths[i]} 失败: {result}")
+                    alive[i] = False
+            outputs[step_name] = step_outputs
+
+            # 步骤末尾收敛掩码：结果里带有效file_path的文件才进入下一步
+            check_indices = []
+            check_paths = []
+            for i in range(n):
+                if not alive[i]:
+                    continue
+                result = step_outputs[i]
+                if isinstance(result, dict) and "file_path" in result:
+                    check_indices.append(i)
+                    check_paths.append(result["file_path"])
+            for i, next_path, exists in zip(check_indices, check_paths,
+                                            self._exists_mask(check_paths)):
+                if exists:
+                    file_paths[i] = next_path
+                else:
+                    alive[i] = False
+
+        # basename只在收尾处计算一次：sys.intern驻留去重，避免循环里反复切字符串
+        basenames = [sys.intern(os.path.basename(p)) for p in outputs["original_path"]]
+
+        results_path = self.config.get("results_path")
+        if not results_path:
+            return {
+                basenames[i]: {
+                    key: column[i] for key, column in outputs.items()
+                }
+                for i in range(n) if alive[i]
+            }
+
+        # 流式落盘：逐文件序列化成JSONL追加写，顺序字节流替代驻留的嵌套dict，
+        # 内存里只留 basename → 字节偏移 的索引，按需用load_result回读
+        with open(results_path, 'ab') as f:
+            for i in range(n):
+                if not alive[i]:
+                    continue
+                basename = basenames[i]
+                record = {key: column[i] for key, column in outputs.items()}
+                self._result_offsets[basename] = f.tell()
+                f.write(_json_dumps_bytes(record) + b"\n")
+        print(f"📝 结果已流式写入 {results_path}（{len(self._result_offsets)} 条）")
+        return dict(self._result_offsets)
+
+    def load_result(self, basename: str) -> Optional[Dict[str, Any]]:
+        """按文件名从results.jsonl回读单条结果（基于偏移索引，单次seek+readline）"""
+        results_path = self.config.get("results_path")
+        offset = self._result_offsets.get(basename)
+        if results_path is None or offset is None:
+            return None
+        with open(results_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def _dispatch_to_worker(self, module_info: Dict[str, Any],
+                            input_data: Dict[str, Any]) -> Tuple[Any, Optional[str]]:
+        """向该模块venv的常驻worker发送一条请求并等待响应
+
+        worker由EnvironmentManager按(venv, 脚本)维护，进程内所有管线实例
+        共享；每次分发只剩一次管道写+读，不再逐文件付解释器启动成本。
+        """
+        return EnvironmentManager.run_in_worker(
+            venv_path=module_info.get("venv_path"),
+            script=module_info["path"],
+            input_data=input_data
+        )
+
+    def _shared_frame_meta(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """把文件解码一次放进共享内存，返回(shm_name, shape, dtype)描述
+
+        多个步骤触达同一文件时，只解码一次：下游模块按名字attach，零拷贝
+        读同一份物理页，磁盘读取和解码成本从 触达步骤数× 降到 1×。
+        需要numpy和cv2，缺失时返回None（调用方退回文件路径协议）。
+        """
+        cached = self._shm_cache.get(file_path)
+        if cached is not None:
+            return cached[1]
+        try:
+            import numpy as np
+            import cv2
+            from multiprocessing import shared_memory
+        except ImportError:
+            return None
+
+        img = cv2.imread(file_path)
+        if img is None:
+            return None
+        shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+        np.ndarray(img.shape, img.dtype, buffer=shm.buf)[:] = img
+        meta = {"shm_name": shm.name, "shape": list(img.shape), "dtype": str(img.dtype)}
+
+        # 简单LRU：超出帧预算时释放最久前缓存的帧
+        max_frames = self.config.get("shm_cache_frames", 32)
+        while len(self._shm_cache) >= max_frames:
+            oldest = next(iter(self._shm_cache))
+            old_shm, _ = self._shm_cache.pop(oldest)
+            old_shm.close()
+            old_shm.unlink()
+
+        self._shm_cache[file_path] = (shm, meta)
+        return meta
+
+    def release_shared_frames(self) -> None:
+        """释放所有共享内存帧（最后一个步骤结束后调用）"""
+        for shm, _ in self._shm_cache.values():
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception:
+                pass
+        self._shm_cache.clear()
+
+    def shutdown_workers(self) -> None:
+        """关闭所有常驻worker进程（进程退出时atexit也会兜底清理）"""
+        EnvironmentManager.shutdown_workers()
+
+    @staticmethod
+    def _exists_mask(paths: List[str]) -> List[bool]:
+        """批量检查路径存在性，返回与输入对齐的布尔掩码
+
+        这个循环的开销几乎全在stat系统调用上（GIL在调用期间释放），
+        大批量时用线程池把syscall等待摊到多核，小批量直接顺序检查。
+        """
+        if len(paths) < 256:
+            return [os.path.exists(p) for p in paths]
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(32, os.cpu_count() or 1)) as executor:
+            return list(executor.map(os.path.exists, paths))
+
+    def _run_external_batch(self, module_info: Dict[str, Any],
+                            input_datas: List[Dict[str, Any]]) -> List[Tuple[Any, Optional[str]]]:
+        """批量异步执行外部模块：整批子进程同时提交，完成后统一收集
+
+        与逐个调用EnvironmentManager.run_in_environment相比，每个文件批次
+        50-200ms的fork+解释器启动+环境激活开销在批内相互重叠而不是串行累加。
+        沿用外部脚本的临时文件协议（argv传入输入/输出JSON路径）。
+        单线程事件循环编排全部子进程，Semaphore按CPU核数限制同时在跑的
+        进程数，批次很大时也不会一口气fork出几百个解释器。
+        """
+        if not os.path.exists(module_info["path"]):
+            raise ValueError(f"外部模块脚本不存在: {module_info['path']}")
+        activate_cmd = EnvironmentManager.get_activate_command(module_info.get("venv_path"))
+        sem: Optional[asyncio.Semaphore] = None  # 在事件循环内创建
+
+        async def _run_one(input_data: Dict[str, Any]) -> Tuple[Any, Optional[str]]:
+            async with sem:
+                return await _run_one_unbounded(input_data)
+
+        async def _run_one_unbounded(input_data: Dict[str, Any]) -> Tuple[Any, Optional[str]]:
+            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
+                json.dump(input_data, f)
+                input_file = f.name
+            output_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+
+            command_str = ' '.join(["python", module_info["path"], input_file, output_file])
+            full_command = f"{activate_cmd} {command_str}" if activate_cmd else command_str
+            try:
+                proc = await asyncio.create_subprocess_shell(
+                    full_command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                _, stderr = await proc.communicate()
+                if proc.returncode != 0:
+                    return None, (f"命令执行失败: 退出码 {proc.returncode}, "
+                                  f"错误: {stderr.decode(errors='replace')}, 命令: {full_command}")
+                with open(output_file, 'r') as f:
+                    return json.load(f), None
+            except Exception as e:
+                return None, f"处理过程出错: {str(e)}, 命令: {full_command}"
+            finally:
+                for tmp_path in (input_file, output_file):
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+        async def _gather() -> List[Tuple[Any, Optional[str]]]:
+            nonlocal sem
+            sem = asyncio.Semaphore(os.cpu_count() or 4)
+            return await asyncio.gather(*(_run_one(d) for d in input_datas))
+
+        return asyncio.run(_gather())
+
+    def _validate_step_static(self, step: Dict[str, Any]) -> None:
+        """步骤开始前做一次静态校验
+
+        init_params在文件间只有file_path不同，必填/多余/类型检查对整个
+        步骤不变，提前到步骤粒度执行，逐文件路径上不再走inspect相关逻辑。
+        """
+        if step.get("_validated"):
+            return  # 同一步骤对象重复run()时只校验一次
+        module_info = self.modules.get(step["module_name"])
+        if module_info is None or module_info["type"] != "local":
+            return
+        module_class = module_info.get("_class")
+        if not module_class:
+            return
+        step["_validated"] = True
+        init_params = module_info["config"].copy()
+        init_params["file_path"] = "__placeholder__"
+        self._validate_init_params(
+            module_class, init_params, step["module_name"], step["step_name"])
+
+    def _process_single_step(self, input_dir: str, step: Dict[str, Any]) -> Tuple[bool, Any]:
+        """处理单个文件的单个步骤，返回(是否成功, 结果或错误描述)
+
+        可预判的失败（模块未注册、类未解析、脚本不存在）走前置检查直接
+        返回哨兵值，不经过异常机制；try只包住真正不可预期的模块执行。
+        """
         step_name = step["step_name"]
         module_name = step["module_name"]
-        input_params = step["input_params"]
-      
-        if module_name not in self.modules:
-            raise ValueError(f"模块 {module_name} 未注册")
-      
-        module_info = self.modules[module_name]
+
+        # 前置检查：热循环里的常见失败不该抛异常
+        module_info = self.modules.get(module_name)
+        if module_info is None:
+            return False, f"模块 {module_name} 未注册"
         module_config = module_info["config"]
-      
+
         # 执行模块处理（复用原有的本地/外部模块处理逻辑）
         if module_info["type"] == "local":
-            module_class = globals().get(module_info["path"])
+            module_class = module_info.get("_class")
             if not module_class:
-                raise ValueError(f"未找到本地模块类 {module_info['path']}")
-          
+                return False, f"未找到本地模块类 {module_info['path']}"
+
+            # 静态校验已在步骤开始时由_validate_step_static做过一次
             init_params = module_config.copy()
             init_params["file_path"] = input_dir
-            self._validate_init_params(module_class, init_params, module_name, step_name)
-          
+
             try:
                 module_instance = module_class(**init_params)
-                return module_instance.process()
+                return True, module_instance.process()
             except Exception as e:
-                raise RuntimeError(
-                    f"本地模块 {module_class.__name__} 处理失败：{str(e)}"
-                ) from e
-              
+                return False, f"本地模块 {module_class.__name__} 处理失败：{str(e)}"
+
         elif module_info["type"] == "external":
             if not os.path.exists(module_info["path"]):
-                raise ValueError(f"外部模块脚本不存在: {module_info['path']}")
-          
+                return False, f"外部模块脚本不存在: {module_info['path']}"
+
             input_data = {
                 "file_path": input_dir,
                 "config": module_config
             }
-          
-            command = ["python", module_info["path"]]
-            venv_path = module_info.get("venv_path")
-          
-            result, error = EnvironmentManager.run_in_environment(
-                venv_path=venv_path,
-                command=command,
-                input_data=input_data
-            )
-          
+
+            # 模块声明需要解码后的像素时，解码一次放进共享内存按名字传递
+            if module_info.get("needs") == "decoded_array" and os.path.isfile(input_dir):
+                frame_meta = self._shared_frame_meta(input_dir)
+                if frame_meta:
+                    input_data["decoded_frame"] = frame_meta
+
+            try:
+                if module_info.get("persistent"):
+                    result, error = self._dispatch_to_worker(module_info, input_data)
+                else:
+                    command = ["python", module_info["path"]]
+                    venv_path = module_info.get("venv_path")
+                    result, error = EnvironmentManager.run_in_environment(
+                        venv_path=venv_path,
+                        command=command,
+                        input_data=input_data
+                    )
+            except Exception as e:
+                return False, f"外部模块执行出错: {str(e)}"
+
             if error:
-                raise ValueError(f"外部模块执行错误: {error}")
-            return result
+                return False, f"外部模块执行错误: {error}"
+            return True, result
         else:
-            raise ValueError(f"不支持的模块类型: {module_info['type']}")
+            return False, f"不支持的模块类型: {module_info['type']}"
     
-    def _get_media_files(self, input_path: str) -> List[str]: 
-        """获取所有符合条件的图片和视频文件路径"""
-        media_files = []
-        video_extensions = self.config["supported_formats"]
-        image_extensions = self.config["supported_image_formats"] 
-        
+    def _get_media_files(self, input_path: str) -> List[str]:
+        """获取所有符合条件的图片和视频文件路径
+
+        用os.scandir递归遍历（复用getdents64带回的文件类型，不额外stat）。
+        扩展名统一经_fast_ext取小片段lower后查frozenset——不对整个文件名
+        做lower()拷贝，且与classify_files的判定语义完全一致。
+        """
+        ext_set = self._ext_set
+
         # 如果是单个文件
         if os.path.isfile(input_path):
-            ext = os.path.splitext(input_path)[1].lower()
-            if ext in video_extensions or ext in image_extensions:
-                media_files.append(input_path)
-            return media_files
-        
-        # 如果是文件夹，遍历所有文件
-        for root, _, files in os.walk(input_path):
-            for file in files:
-                ext = os.path.splitext(file)[1].lower()
-                if ext in video_extensions or ext in image_extensions:  
-                    media_files.append(os.path.join(root, file))
-        
-        return sorted(media_files)  # 按路径排序
+            if _fast_ext(os.path.basename(input_path)) in ext_set:
+                return [input_path]
+            return []
+
+        # 如果是文件夹，递归遍历：每个目录内部单独排序，最后heapq.merge
+        # 归并——O(N log D)（D为目录数）而不是对全量列表做O(N log N)全排序
+        per_dir_sorted: List[List[str]] = []
+
+        def _walk(path: str) -> None:
+            matched = []
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        _walk(entry.path)
+                    elif _fast_ext(entry.name) in ext_set:
+                        matched.append(entry.path)
+            if matched:
+                matched.sort()
+                per_dir_sorted.append(matched)
+
+        _walk(input_path)
+        return list(heapq.merge(*per_dir_sorted))  # 按路径排序
 
     def _process_single_file(self, file_path: str) -> Dict[str, Any]:
         """处理单个文件，按原始步骤顺序逐个处理（执行或桥接），保证依赖连续性"""
         current_data: Dict[str, Any] = {"input": file_path}  # 初始输入（文件路径）
         results: Dict[str, Any] = {"original_path": file_path}  # 最终结果记录
+        scope = ChainMap(current_data, results)  # 两个dict的合并视图，整个文件复用
         
-        # 1. 判断文件类型（图片/视频）
-        ext = os.path.splitext(file_path)[1].lower()
-        is_image = ext in self.config.get("supported_image_formats", [])
-        is_video = ext in self.config["supported_formats"]
-        print(f"文件类型: {'图片' if is_image else '视频'}")
+        # 1. 判断文件类型（图片/视频）——与遍历同一套_fast_ext+frozenset查询
+        ext = _fast_ext(os.path.basename(file_path))
+        is_image = ext in self._image_exts
+        is_video = ext in self._video_exts
+        self._log(f"文件类型: {'图片' if is_image else '视频'}")
     
         # 2. 按原始步骤顺序逐个处理（关键修改：保持步骤顺序）
-        for step in self.pipeline_steps:  # 遍历原始步骤列表，不提前拆分
-            step_name = step["step_name"]
-            output_key = step["output_key"]
-            input_key = next(iter(step["input_params"].values()), None)  # 解析上游依赖
+        # 热字段走finalize预建的SoA镜像，每步省掉几次dict哈希查找；
+        # 手工add_step后没调finalize时镜像是空的，这里兜底重建，
+        # 否则会静默执行零个步骤
+        if len(self._step_names) != len(self.pipeline_steps):
+            self.finalize()
+        steps = self.pipeline_steps
+        for i in range(len(self._step_names)):  # 遍历原始步骤列表，不提前拆分
+            step = steps[i]
+            step_name = self._step_names[i]
+            output_key = self._step_output_keys[i]
+            resolved_inputs = step["_resolved_inputs"]
+            input_key = resolved_inputs[0][1] if resolved_inputs else None  # 解析上游依赖
             
             # 检查上游依赖是否存在（此时上游步骤已处理，理论上必存在）
             if input_key is None:
@@ -422,42 +1074,50 @@ class DataProcessingPipeline:
                 bridge_value = current_data[input_key] or results[input_key]
                 results[output_key] = bridge_value
                 current_data[output_key] = bridge_value
-                print(f"🔗 桥接跳过的步骤 {step_name}：{input_key} → {output_key}")
+                self._log(f"🔗 桥接跳过的步骤 {step_name}：{input_key} → {output_key}")
             else:
                 # 执行：按原逻辑处理步骤
-                module_name = step["module_name"]
+                module_name = self._step_modules[i]
                 try:
                     if module_name not in self.modules:
                         raise ValueError(f"模块 {module_name} 未注册")
                     module_info = self.modules[module_name]
                     module_config = module_info["config"]
                     
-                    # 准备参数（上游依赖已通过前面的检查，必存在）
-                    params = {param_key: current_data[data_key] or results[data_key] 
-                             for param_key, data_key in step["input_params"].items()}
+                    # 准备参数（上游依赖已通过前面的检查，必存在）：
+                    # 预编译的itemgetter对ChainMap视图一次取全，无逐键合并分配
+                    getter = step.get("_getter")
+                    if getter is not None:
+                        values = getter(scope)
+                        param_keys = step["_param_keys"]
+                        if len(param_keys) == 1:
+                            values = (values,)
+                        params = dict(zip(param_keys, values))
+                    else:
+                        params = {param_key: scope.get(data_key)
+                                  for param_key, data_key in resolved_inputs}
                     
                     # 根据模块类型执行处理
                     if module_info["type"] == "local":
                         # 本地模块（同一环境）
-                        module_class = globals().get(module_info["path"])
+                        module_class = module_info.get("_class")
                         if not module_class:
                             raise ValueError(f"未找到本地模块类 {module_info['path']}")
     
                         video_path = params.get("video_path").get("video_path")
     
                         init_params = module_config.copy()
-                        init_parmas["video_path"] = video_path
+                        init_params["video_path"] = video_path
                         self._validate_init_params(module_class, init_params, module_name, step_name)
     
                         try:
-                          module_instance = module_calss(**init_params)
+                            module_instance = module_class(**init_params)
                         except Exception as e:
-                          raise RuntimeRrror(
-                            f"实例化本地模块{module_calss.__name__}失败：{str(e)}\n"
-                            f"实例化参数：{init_params}"
-                          )from e
-                          traceback.print_exc()
-                          
+                            raise RuntimeError(
+                                f"实例化本地模块{module_class.__name__}失败：{str(e)}\n"
+                                f"实例化参数：{init_params}"
+                            ) from e
+
                         result = module_instance.process()
                         
                     elif module_info["type"] == "external":
@@ -493,93 +1153,52 @@ class DataProcessingPipeline:
                     # 更新数据
                     results[output_key] = result
                     current_data[output_key] = result
-                    print(f"✅ 完成步骤 {step_name}（输出: {output_key}）")
-                    
+                    self._log(f"✅ 完成步骤 {step_name}（输出: {output_key}）")
+
                 except Exception as e:
-                    print(f"❌ 步骤 {step_name} 失败: {str(e)}")
+                    self._log(f"❌ 步骤 {step_name} 失败: {str(e)}")
                     if self.config.get("stop_on_error", True):
                         raise
         
         return results
 
     def _validate_init_params(self, module_class: type, init_params: Dict[str, Any], module_name: str, step_name: str) -> None:
-      """
-      校验实例化参数是否匹配模块类的__init__签名
-      作用：提前发现配置错误，避免运行时崩溃
-      """
-      # 1. 获取类__init__方法的参数签名
-      try:
-          init_signature = inspect.signature(module_class.__init__)
-      except ValueError:
-          # 极少数情况：类没有__init__方法（继承自object且未重写）
-          return
-      
-      # 2. 提取__init__的参数信息（排除self）
-      init_params_meta = list(init_signature.parameters.values())
-      init_param_names = [p.name for p in init_params_meta if p.name != "self"]
-      
-      # 3. 检查必填参数是否缺失（无默认值的参数）
-      required_params = []
-      for param in init_params_meta:
-          if (param.name == "self"):
-              continue
-          # 判断是否为必填参数（无默认值）
-          if param.default == inspect.Parameter.empty:
-              required_params.append(param.name)
-      
-      # 找出配置中缺失的必填参数
-      missing_params = [p for p in required_params if p not in init_params]
-      if missing_params:
-          raise ValueError(
-              f"步骤「{step_name}」的模块「{module_name}」配置缺失必填参数：{missing_params}\n"
-              f"该模块类「{module_class.__name__}」的必填参数为：{required_params}\n"
-              f"请在JSON配置的「{module_name}.config」中补充这些参数"
-          )
-      
-      # 4. 检查是否存在多余参数（可选：避免配置冗余）
-      extra_params = [p for p in init_params if p not in init_param_names]
-      if extra_params:
-          print(f"⚠️ 步骤「{step_name}」的模块「{module_name}」存在多余配置参数：{extra_params}\n"
-                f"该模块类「{module_class.__name__}」仅支持参数：{init_param_names}")
-      
-      # 5. 检查参数类型（可选：需类的__init__有类型注解）
-      for param_name, param_meta in init_signature.parameters.items():
-          if (param_name == "self") or (param_name not in init_params):
-              continue
-          
-          # 获取类__init__中该参数的预期类型（需类定义时加类型注解）
-          expected_type = param_meta.annotation
-          if expected_type == inspect.Parameter.empty:
-              continue  # 无类型注解，跳过校验
-          
-          # 获取配置中的实际参数值和类型
-          actual_value = init_params[param_name]
-          actual_type = type(actual_value)
-          
-          # 校验类型（支持Union类型，如Optional[str] = None）
-          if isinstance(expected_type, type):
-              # 普通类型（如str、int）
-              if not isinstance(actual_value, expected_type):
-                  raise TypeError(
-                      f"步骤「{step_name}」的模块「{module_name}」参数「{param_name}」类型错误\n"
-                      f"预期类型：{expected_type.__name__}，实际类型：{actual_type.__name__}\n"
-                      f"当前配置值：{actual_value}"
-                  )
-          else:
-              # Union类型（如Optional[str]、Union[str, int]）
-              try:
-                  from typing import get_args, get_origin
-                  if get_origin(expected_type) is Union:
-                      expected_types = get_args(expected_type)
-                      if not isinstance(actual_value, expected_types):
-                          raise TypeError(
-                              f"步骤「{step_name}」的模块「{module_name}」参数「{param_name}」类型错误\n"
-                              f"预期类型：{[t.__name__ for t in expected_types]}，实际类型：{actual_type.__name__}\n"
-                              f"当前配置值：{actual_value}"
-                          )
-              except ImportError:
-                  pass  # 环境不支持typing模块，跳过Union类型校验
-  
+        """
+        校验实例化参数是否匹配模块类的__init__签名
+        作用：提前发现配置错误，避免运行时崩溃
+        签名信息走_signature_meta缓存，同一个类只做一次inspect
+        """
+        required_params, init_param_names, type_checks = _signature_meta(module_class)
+
+        # 1. 检查必填参数是否缺失（无默认值的参数）
+        missing_params = set(required_params) - init_params.keys()
+        if missing_params:
+            raise ValueError(
+                f"步骤「{step_name}」的模块「{module_name}」配置缺失必填参数：{sorted(missing_params)}\n"
+                f"该模块类「{module_class.__name__}」的必填参数为：{list(required_params)}\n"
+                f"请在JSON配置的「{module_name}.config」中补充这些参数"
+            )
+
+        # 2. 检查是否存在多余参数（可选：避免配置冗余）
+        extra_params = init_params.keys() - set(init_param_names)
+        if extra_params:
+            print(f"⚠️ 步骤「{step_name}」的模块「{module_name}」存在多余配置参数：{sorted(extra_params)}\n"
+                  f"该模块类「{module_class.__name__}」仅支持参数：{list(init_param_names)}")
+
+        # 3. 检查参数类型（可选：需类的__init__有类型注解；Union已在缓存时展开）
+        for param_name, expected in type_checks:
+            if param_name not in init_params:
+                continue
+            actual_value = init_params[param_name]
+            if not isinstance(actual_value, expected):
+                expected_names = ([t.__name__ for t in expected]
+                                  if isinstance(expected, tuple) else expected.__name__)
+                raise TypeError(
+                    f"步骤「{step_name}」的模块「{module_name}」参数「{param_name}」类型错误\n"
+                    f"预期类型：{expected_names}，实际类型：{type(actual_value).__name__}\n"
+                    f"当前配置值：{actual_value}"
+                )
+
     def list_modules(self) -> None:
         """列出已注册的模块，包括虚拟环境信息"""
         print("\n📦 已注册模块:")
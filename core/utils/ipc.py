@@ -0,0 +1,35 @@
+import pickle
+from typing import Any, BinaryIO
+
+# 帧格式：8字节小端长度前缀 + pickle负载
+_LEN_BYTES = 8
+
+
+def write_frame(stream: BinaryIO, obj: Any) -> None:
+    """向流写入一帧：长度前缀 + pickle（protocol 5）
+
+    相比整体JSON编码，pickle protocol 5支持带外缓冲（PEP 574），
+    numpy数组等大块二进制数据可以零拷贝通过管道，不需要base64/JSON转码。
+    """
+    buf = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(len(buf).to_bytes(_LEN_BYTES, 'little'))
+    stream.write(buf)
+    stream.flush()
+
+
+def read_frame(stream: BinaryIO) -> Any:
+    """从流读取一帧并反序列化，流提前结束时抛EOFError"""
+    header = stream.read(_LEN_BYTES)
+    if len(header) < _LEN_BYTES:
+        raise EOFError("读取帧长度前缀失败：流已结束")
+    length = int.from_bytes(header, 'little')
+
+    chunks = []
+    remaining = length
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            raise EOFError(f"帧数据不完整：预期{length}字节，缺少{remaining}字节")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return pickle.loads(b''.join(chunks))
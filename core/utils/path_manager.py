@@ -1,6 +1,17 @@
 import os
+import stat
 import shutil
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
+
+
+def _fast_ext(name: str) -> str:
+    """取小写扩展名（含点）：一次C层rfind+切片，比os.path.splitext快数倍
+
+    splitext是纯Python实现，带前导点等特殊分支；热路径上只需要最后一个
+    点之后的片段。i > 0同时排除了'.hidden'这类无扩展名的隐藏文件。
+    """
+    i = name.rfind('.')
+    return name[i:].lower() if i > 0 else ''
 
 
 class PathManager:
@@ -8,18 +19,39 @@ class PathManager:
         self,
         supported_image_formats: List[str] = None,
         supported_video_formats: List[str] = None,
-        default_overwrite: bool = False
+        default_overwrite: bool = False,
+        preserve_meta: bool = False
     ):
         """
         路径管理工具类，统一处理路径计算、目录创建、文件复制/移动及文件分类
-        
+
         :param supported_image_formats: 支持的图片扩展名（带点，如 ['.jpg', '.png']）
         :param supported_video_formats: 支持的视频扩展名（带点，如 ['.mp4', '.avi']）
         :param default_overwrite: 默认覆盖策略（处理文件时是否覆盖已存在文件）
+        :param preserve_meta: 批量复制时是否保留mtime/权限（桥接通常不需要）
         """
         self.supported_image_formats = supported_image_formats or ['.jpg', '.jpeg', '.png', '.bmp']
         self.supported_video_formats = supported_video_formats or ['.mp4', '.avi', '.mov', '.mkv']
         self.default_overwrite = default_overwrite
+        self.preserve_meta = preserve_meta
+        self._created_dirs: set = set()  # 已确认存在的目录，短路重复的mkdir/stat
+        # 预构建 扩展名→类型 映射，分类时一次dict查找替代两次列表线性扫描
+        self._ext_to_type = {ext: "image" for ext in self.supported_image_formats}
+        self._ext_to_type.update({ext: "video" for ext in self.supported_video_formats})
+        # 分类结果缓存：目录 → (st_mtime_ns, 分类dict)，目录未变时跳过整次重扫
+        self._classify_cache: Dict[str, Tuple[int, Dict[str, List[str]]]] = {}
+
+    def _ensure_dir(self, path: str) -> None:
+        """建目录（带记忆）：同一路径只付一次makedirs的mkdir/stat系统调用"""
+        if path in self._created_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        self._created_dirs.add(path)
+
+    def clear_dir_cache(self) -> None:
+        """清空目录与分类缓存（外部直接增删了目录/文件后调用）"""
+        self._created_dirs.clear()
+        self._classify_cache.clear()
 
     def get_relative_path(self, file_path: str, base_dir: str) -> str:
         """获取文件相对于基准目录的相对路径"""
@@ -30,7 +62,7 @@ class PathManager:
         rel_dir = os.path.dirname(relative_path)
         file_name = os.path.basename(relative_path)
         output_dir = os.path.join(output_root, rel_dir)
-        os.makedirs(output_dir, exist_ok=True)
+        self._ensure_dir(output_dir)
         output_file_path = os.path.join(output_dir, file_name)
         return output_dir, output_file_path
 
@@ -64,26 +96,143 @@ class PathManager:
             shutil.move(source_file, output_file)
         return output_file
 
+    def _fast_copy(self, source_file: str, target_path: str,
+                   preserve_meta: bool = False) -> None:
+        """单文件快速复制，三级退化：copy_file_range → sendfile → shutil
+
+        第一级数据全程留在内核（XFS/Btrfs上可退化成CoW reflink克隆）；
+        第二级sendfile让页缓存直达目标fd，省掉 内核→用户态→内核 的一次
+        memcpy；两者都不可用或失败时才退回shutil的用户态循环。
+
+        preserve_meta=False（默认）只复制数据，不碰mtime/权限——copystat
+        每个文件要付utime/chmod/chflags加xattr读取共四五个系统调用，
+        桥接场景下游根本不看这些元数据。
+        """
+        fallback_copy = shutil.copy2 if preserve_meta else shutil.copyfile
+        if not (hasattr(os, 'copy_file_range') or hasattr(os, 'sendfile')):
+            fallback_copy(source_file, target_path)
+            return
+        try:
+            src_fd = os.open(source_file, os.O_RDONLY)
+        except OSError:
+            fallback_copy(source_file, target_path)
+            return
+        try:
+            st = os.fstat(src_fd)
+            if not stat.S_ISREG(st.st_mode):
+                raise OSError(f"非普通文件: {source_file}")
+            dst_fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                done = False
+                if hasattr(os, 'copy_file_range'):
+                    try:
+                        remaining = st.st_size
+                        while remaining > 0:
+                            copied = os.copy_file_range(src_fd, dst_fd, remaining)
+                            if copied == 0:
+                                break
+                            remaining -= copied
+                        done = True
+                    except OSError:
+                        # 文件系统不支持（EXDEV/ENOSYS/EINVAL），复位后降级到sendfile
+                        os.lseek(src_fd, 0, os.SEEK_SET)
+                        os.ftruncate(dst_fd, 0)
+                        os.lseek(dst_fd, 0, os.SEEK_SET)
+                if not done:
+                    remaining = st.st_size
+                    while remaining > 0:
+                        sent = os.sendfile(dst_fd, src_fd, None, remaining)
+                        if sent == 0:
+                            break
+                        remaining -= sent
+            finally:
+                os.close(dst_fd)
+        except OSError:
+            os.close(src_fd)
+            fallback_copy(source_file, target_path)
+            return
+        os.close(src_fd)
+        if preserve_meta:
+            # 从已缓存的stat直接补mtime和权限（两个syscall），不走copystat
+            # 的xattr/chflags全家桶
+            os.utime(target_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.chmod(target_path, stat.S_IMODE(st.st_mode))
+
+    def _fast_move(self, source_file: str, target_path: str) -> None:
+        """单文件快速移动：同设备直接rename；跨设备用快速复制+删除源文件"""
+        try:
+            os.rename(source_file, target_path)
+        except OSError:
+            self._fast_copy(source_file, target_path)
+            os.remove(source_file)
+
+    def _cached_dir_mtime(self, output_dir: str) -> Optional[int]:
+        """批量写入前取目录当前mtime，写入后据此判断期间是否有他方改动"""
+        if output_dir not in self._classify_cache:
+            return None
+        try:
+            return os.stat(output_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _absorb_written(self, output_dir: str, target_paths: List[str],
+                        pre_mtime: Optional[int]) -> None:
+        """把批量写入的目标路径就地并进输出目录的分类缓存
+
+        桥接写入的路径是已知的，没必要让缓存失效后整目录重扫：按类型
+        分组后走extend_classification追加。已在缓存里的路径跳过
+        （overwrite/跳过分支下同名文件可能早已分类过），只刷新mtime。
+
+        pre_mtime是本次批量写入开始前的目录mtime：与缓存记录不一致说明
+        上次扫描之后有别的写入方（如直接落盘的处理模块）动过目录，缓存
+        里缺了不归我们管的文件，此时只能老实失效、下次整目录重扫。
+        """
+        cached = self._classify_cache.get(output_dir)
+        if cached is None:
+            return
+        if pre_mtime is None or cached[0] != pre_mtime:
+            self._classify_cache.pop(output_dir, None)
+            return
+        existing = {p for paths in cached[1].values() for p in paths}
+        by_type: Dict[str, List[str]] = {}
+        for path in target_paths:
+            if path not in existing:
+                by_type.setdefault(self.get_file_type(path), []).append(path)
+        if not by_type:
+            # 没有新路径也要刷新记录的mtime（rename覆盖同名会改目录mtime）
+            try:
+                self._classify_cache[output_dir] = (os.stat(output_dir).st_mtime_ns, cached[1])
+            except OSError:
+                self._classify_cache.pop(output_dir, None)
+            return
+        for file_type, paths in by_type.items():
+            self.extend_classification(output_dir, file_type, paths)
+
     # 在现有PathManager类中添加以下方法
     def batch_copy_files(
         self,
         source_files: List[str],
         output_dir: str,
-        overwrite: Optional[bool] = None
+        overwrite: Optional[bool] = None,
+        preserve_meta: Optional[bool] = None
     ) -> List[str]:
         """
         批量复制文件到目标目录（不维持原始子目录，直接放在output_dir下）
+        :param preserve_meta: 是否保留mtime/权限，None时用实例默认值
         :return: 复制后的文件路径列表
         """
         overwrite = self.default_overwrite if overwrite is None else overwrite
-        os.makedirs(output_dir, exist_ok=True)
+        preserve_meta = self.preserve_meta if preserve_meta is None else preserve_meta
+        self._ensure_dir(output_dir)
+        pre_mtime = self._cached_dir_mtime(output_dir)
         target_paths = []
         for source_file in source_files:
             file_name = os.path.basename(source_file)
             target_path = os.path.join(output_dir, file_name)
-            if not os.path.exists(target_path) or overwrite:
-                shutil.copy2(source_file, target_path)
+            if overwrite or not os.path.exists(target_path):
+                self._fast_copy(source_file, target_path, preserve_meta)
             target_paths.append(target_path)
+        self._absorb_written(output_dir, target_paths, pre_mtime)  # 新写入的路径直接并进分类缓存
         return target_paths
 
     def batch_move_files(
@@ -92,38 +241,146 @@ class PathManager:
         output_dir: str,
         overwrite: Optional[bool] = None
     ) -> List[str]:
-        """批量移动文件到目标目录（不维持原始子目录）"""
+        """批量移动文件到目标目录（不维持原始子目录）
+
+        同设备批量移动时每个文件只剩一次rename系统调用：rename本身原子
+        覆盖目标，overwrite=True路径不再逐文件先stat探测是否存在。
+        """
+        overwrite = self.default_overwrite if overwrite is None else overwrite
+        self._ensure_dir(output_dir)
+        pre_mtime = self._cached_dir_mtime(output_dir)
+        target_paths = []
+        for source_file in source_files:
+            file_name = os.path.basename(source_file)
+            target_path = os.path.join(output_dir, file_name)
+            if overwrite or not os.path.exists(target_path):
+                self._fast_move(source_file, target_path)
+            target_paths.append(target_path)
+        # 目标目录的新路径并进缓存；来源目录少了文件，缓存只能失效重扫
+        self._absorb_written(output_dir, target_paths, pre_mtime)
+        for src_dir in {os.path.dirname(f) for f in source_files}:
+            self._classify_cache.pop(src_dir, None)
+        return target_paths
+
+    def batch_link_files(
+        self,
+        source_files: List[str],
+        output_dir: str,
+        overwrite: Optional[bool] = None
+    ) -> List[str]:
+        """批量硬链接文件到目标目录（共享inode，零字节搬运，一次syscall/文件）
+
+        下游只读的桥接场景用它替代复制，O(字节)的工作量塌缩成O(文件数)；
+        跨设备（EXDEV）等失败逐文件退回快速复制。
+        """
+        overwrite = self.default_overwrite if overwrite is None else overwrite
+        self._ensure_dir(output_dir)
+        pre_mtime = self._cached_dir_mtime(output_dir)
+        target_paths = []
+        for source_file in source_files:
+            file_name = os.path.basename(source_file)
+            target_path = os.path.join(output_dir, file_name)
+            if overwrite or not os.path.lexists(target_path):
+                if os.path.lexists(target_path):
+                    os.remove(target_path)
+                try:
+                    os.link(source_file, target_path)
+                except OSError:
+                    self._fast_copy(source_file, target_path)
+            target_paths.append(target_path)
+        self._absorb_written(output_dir, target_paths, pre_mtime)  # 新写入的路径直接并进分类缓存
+        return target_paths
+
+    def batch_symlink_files(
+        self,
+        source_files: List[str],
+        output_dir: str,
+        overwrite: Optional[bool] = None
+    ) -> List[str]:
+        """批量把文件以链接方式放进目标目录（不搬动数据字节）
+
+        优先硬链接（一次系统调用、零数据I/O、共享inode），跨设备或文件
+        系统不支持时退回软链接，再不行退回快速复制。适合只读暂存目录。
+        """
         overwrite = self.default_overwrite if overwrite is None else overwrite
-        os.makedirs(output_dir, exist_ok=True)
+        self._ensure_dir(output_dir)
+        pre_mtime = self._cached_dir_mtime(output_dir)
         target_paths = []
         for source_file in source_files:
             file_name = os.path.basename(source_file)
             target_path = os.path.join(output_dir, file_name)
-            if not os.path.exists(target_path) or overwrite:
-                shutil.move(source_file, target_path)
+            if overwrite or not os.path.lexists(target_path):
+                if os.path.lexists(target_path):
+                    os.remove(target_path)
+                try:
+                    os.link(source_file, target_path)
+                except OSError:
+                    try:
+                        os.symlink(os.path.abspath(source_file), target_path)
+                    except OSError:
+                        self._fast_copy(source_file, target_path)
             target_paths.append(target_path)
+        self._absorb_written(output_dir, target_paths, pre_mtime)  # 新写入的路径直接并进分类缓存
         return target_paths
 
     def get_file_type(self, file_path: str) -> str:
         """判断文件类型（image/video/other）"""
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in self.supported_image_formats:
-            return "image"
-        elif ext in self.supported_video_formats:
-            return "video"
-        else:
-            return "other"
+        return self._ext_to_type.get(_fast_ext(os.path.basename(file_path)), "other")
 
     def classify_files(self, root_dir: str) -> Dict[str, List[str]]:
         """
         递归遍历目录，按文件类型分类
-        
+
+        用os.scandir迭代栈遍历：目录项类型直接取自getdents64结果，不再给
+        每个文件额外付一次stat；扩展名只切rfind('.')之后的小片段查映射表。
+
+        顶层目录mtime未变时直接命中缓存（批量复制/移动接口写入后会把新
+        路径并进对应条目；绕过本类直接写子目录的调用方需自行
+        clear_dir_cache）。
+
         :return: 分类结果，格式 {"image": [file_paths], "video": [file_paths], "other": [file_paths]}
         """
+        try:
+            dir_mtime = os.stat(root_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        else:
+            cached = self._classify_cache.get(root_dir)
+            if cached is not None and cached[0] == dir_mtime:
+                return cached[1]
+
         classified = {"image": [], "video": [], "other": []}
-        for root, _, files in os.walk(root_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_type = self.get_file_type(file_path)
-                classified[file_type].append(file_path)
+        for file_type, file_path in self.classify_files_iter(root_dir):
+            classified[file_type].append(file_path)
+
+        if dir_mtime is not None:
+            self._classify_cache[root_dir] = (dir_mtime, classified)
         return classified
+
+    def classify_files_iter(self, root_dir: str) -> Iterator[Tuple[str, str]]:
+        """流式分类：逐个产出(文件类型, 路径)，不一次性物化整棵树的路径列表
+
+        超大目录（几十万文件）的调用方可以边遍历边分块消费，内存占用
+        与批大小而不是树大小成正比；classify_files是它的物化包装。
+        """
+        ext_to_type = self._ext_to_type
+        stack = [root_dir]
+        while stack:
+            current = stack.pop()
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        yield ext_to_type.get(_fast_ext(entry.name), "other"), entry.path
+
+    def extend_classification(self, output_dir: str, file_type: str, paths: List[str]) -> None:
+        """桥接等场景写入的文件路径是已知的：直接并进缓存分类，免去整次重扫"""
+        cached = self._classify_cache.get(output_dir)
+        if cached is None:
+            return
+        cached[1].setdefault(file_type, []).extend(paths)
+        try:
+            self._classify_cache[output_dir] = (os.stat(output_dir).st_mtime_ns, cached[1])
+        except OSError:
+            self._classify_cache.pop(output_dir, None)
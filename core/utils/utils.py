@@ -1,44 +1,104 @@
-def write_processing_log(results: dict, pipeline_steps: list, log_dir: str = "processing_logs") -> None:
-    """将批量处理结果写入日志文件（适配新的批量处理格式）"""
+import io
+import json
+import os
+from datetime import datetime
+
+
+# 单个日志文件的轮转阈值；超过后改名加.1后缀（只保留上一代）
+_LOG_ROTATE_BYTES = 64 << 20
+
+
+def _append_log(log_dir: str, data: bytes, durable: bool = False) -> str:
+    """把一条完整日志记录追加进单一日志文件，按大小轮转
+
+    每次运行不再新建时间戳文件（省掉目录项创建等元数据写盘），统一
+    追加到pipeline.log：O_APPEND下单次write原子追加，写入是顺序的、
+    对页缓存友好。超过阈值时rename成.1开新文件。
+
+    默认不fsync：诊断日志的落盘交给OS页缓存回写，每条记录不付磁盘
+    屏障的代价；确有持久性要求时传durable=True。
+    """
+    path = os.path.join(log_dir, "pipeline.log")
+    try:
+        if os.path.getsize(path) > _LOG_ROTATE_BYTES:
+            os.replace(path, path + ".1")
+    except OSError:
+        pass  # 文件还不存在
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        # 整条记录在内存拼好后尽量一次写出；万一内核部分写（普通文件上
+        # 极少见），循环补齐余下字节，tail住日志的读者不会看到半条记录
+        # 后就没了下文
+        written = os.write(fd, data)
+        while written < len(data):
+            written += os.write(fd, data[written:])
+        if durable:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    return path
+
+
+def write_batch_processing_log(results: dict, pipeline_steps: list, log_dir: str = "processing_logs",
+                               durable: bool = False) -> None:
+    """将批量处理结果写入日志文件（适配新的批量处理格式）
+
+    全部内容先攒进C实现的io.StringIO，最后一次write落盘：原先每步骤
+    十几次小f.write要各过一遍文本IO层，现在整个日志只剩一次写调用，
+    拼接也不再反复分配中间列表元素。
+    """
     os.makedirs(log_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file_path = os.path.join(log_dir, f"processing_log_{timestamp}.txt")
-    
-    with open(log_file_path, "w", encoding="utf-8") as f:
-        f.write(f"=== 数据处理管线日志 ===\n")
-        f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"总步骤数: {len(pipeline_steps)}\n")
-        f.write(f"步骤名称列表: {[step['step_name'] for step in pipeline_steps]}\n")
-        f.write("="*50 + "\n\n")
-        
-        # 记录各步骤详细结果
-        for step_idx, step_result in enumerate(results.get("steps", []), 1):
-            f.write(f"【步骤{step_idx}】{step_result['step_name']}\n")
-            f.write(f"输入目录: {step_result['input_dir']}\n")
-            f.write(f"输出目录: {step_result['output_dir']}\n")
-            f.write(f"输入文件分类: {step_result['input_classified']}\n")
-            
-            # 处理信息
-            processed = step_result['step_result']
-            f.write("处理统计:\n")
-            f.write(f"  处理类型: {[t for t in processed['processed_types']]}\n")
-            f.write(f"  处理文件数: {processed['processed_count']}\n")
-            
-            # 桥接信息
-            if processed['bridged']:
-                f.write("桥接信息:\n")
-                for bridge in processed['bridged']:
-                    f.write(f"  类型: {bridge['type']}, 数量: {bridge['count']}, 动作: {bridge['action']}\n")
-            
-            # 错误信息
-            if processed['errors']:
-                f.write("错误信息:\n")
-                for error in processed['errors']:
-                    f.write(f"  类型: {error['type']}, 阶段: {error['stage']}, 错误: {error['error']}\n")
-
-            # 详细处理信息
-            f.write(f"模块处理细节：\n")
-            f.write(f"{processed["module_details"]}")
-            f.write("-"*30 + "\n\n")
-    
+    now = datetime.now()  # 只取一次时间，记录头部使用
+
+    buf = io.StringIO()
+    w = buf.write  # 绑定方法提出来，循环里少一次属性查找
+    w("=== 数据处理管线日志 ===\n")
+    w(f"处理时间: {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    w(f"总步骤数: {len(pipeline_steps)}\n")
+    w(f"步骤名称列表: {[step['step_name'] for step in pipeline_steps]}\n")
+    w("=" * 50 + "\n\n")
+
+    # 记录各步骤详细结果
+    for step_idx, step_result in enumerate(results.get("steps", []), 1):
+        # 热字段一次性解包成局部变量，循环体里不再重复 哈希+dict查找
+        name = step_result['step_name']
+        input_dir = step_result['input_dir']
+        output_dir = step_result['output_dir']
+        classified = step_result['input_classified']
+        processed = step_result['step_result']
+        bridged = processed['bridged']
+        errors = processed['errors']
+
+        w(f"【步骤{step_idx}】{name}\n")
+        w(f"输入目录: {input_dir}\n")
+        w(f"输出目录: {output_dir}\n")
+        w(f"输入文件分类: {classified}\n")
+
+        # 处理信息
+        w("处理统计:\n")
+        w(f"  处理类型: {processed['processed_types']}\n")
+        w(f"  处理文件数: {processed['processed_count']}\n")
+
+        # 桥接信息
+        if bridged:
+            w("桥接信息:\n")
+            for bridge in bridged:
+                w(f"  类型: {bridge['type']}, 数量: {bridge['count']}, 动作: {bridge['action']}\n")
+
+        # 错误信息
+        if errors:
+            w("错误信息:\n")
+            for error in errors:
+                w(f"  类型: {error['type']}, 阶段: {error['stage']}, 错误: {error['error']}\n")
+
+        # 详细处理信息：嵌套结构走C实现的json.dumps，比逐层repr快得多，
+        # 本来就是字符串时原样写入，不再套一层f-string的__format__调用
+        md = processed['module_details']
+        w("模块处理细节：\n")
+        w(md if isinstance(md, str)
+          else json.dumps(md, ensure_ascii=False, separators=(',', ':'), default=str))
+        w("-" * 30 + "\n\n")
+
+    log_file_path = _append_log(log_dir, buf.getvalue().encode("utf-8"), durable)
+
     print(f"\n✅ 日志文件已保存至: {log_file_path}")
@@ -1,19 +1,194 @@
 import os
+import atexit
+import functools
+import logging
+import shlex
 import subprocess
 import tempfile
+import threading
 import json
 import sys
 import importlib
-from typing import List, Any, Tuple, Dict, Optinal
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Tuple, Dict
+
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str)
+except ImportError:
+    # 无orjson时退回标准库，协议不变
+    _loads = json.loads
+
+    def _dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, default=str).encode('utf-8')
+
+
+logger = logging.getLogger("pipeline")
+
 
 class EnvironmentManager:
     """环境管理工具类，负责处理虚拟环境激活和命令执行，支持conda环境"""
-    
+
+    # 常驻worker缓存：(venv_path, script) → Popen，整个进程生命周期内复用。
+    # worker跨线程共享（每模块只起一个解释器），管道上的 写请求+读响应
+    # 必须由同键的锁包住，否则并发调用会读到彼此的响应
+    _workers: Dict[Tuple[str, str], subprocess.Popen] = {}
+    _worker_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    _spawn_lock = threading.Lock()
+    # 常驻shell缓存：(venv_path, 线程id) → 已完成激活的bash。按线程隔离，
+    # run_many的并发调用各用各的shell，stdin/stdout不会交错；conda
+    # activate的成本每线程×每环境只付一次
+    _shells: Dict[Tuple[str, int], subprocess.Popen] = {}
+    _SHELL_SENTINEL = "__PIPELINE_CMD_DONE__"
+
+    @staticmethod
+    def get_python_executable(venv_path: str) -> str:
+        """解析虚拟环境里的python解释器路径，找不到时退回当前解释器"""
+        if not venv_path:
+            return sys.executable
+        sub = ('Scripts', 'python.exe') if os.name == 'nt' else ('bin', 'python')
+        candidate = os.path.join(venv_path, *sub)
+        return candidate if os.path.exists(candidate) else sys.executable
+
+    @classmethod
+    def get_or_spawn_worker(cls, venv_path: str, script: str) -> subprocess.Popen:
+        """获取（必要时启动）指定venv+脚本的常驻worker进程
+
+        worker用venv自己的解释器加载脚本一次，之后循环处理JSON-lines任务；
+        解释器启动和cv2/torch等重依赖的导入成本整个管线只付一次。
+        stdin/stdout管道fd在worker整个生命周期内固定复用，每个任务只剩
+        一次write+read，不再产生任何fd的打开/关闭。
+        """
+        key = (venv_path or "", script)
+        worker = cls._workers.get(key)
+        if worker is not None and worker.poll() is None:
+            return worker
+
+        with cls._spawn_lock:
+            # 双重检查：等锁期间别的线程可能已经把worker拉起来了
+            worker = cls._workers.get(key)
+            if worker is not None and worker.poll() is None:
+                return worker
+            worker_script = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), '..', 'workers', 'venv_worker.py')
+            worker = subprocess.Popen(
+                [cls.get_python_executable(venv_path), '-u', worker_script, script],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            cls._workers[key] = worker
+            cls._worker_locks.setdefault(key, threading.Lock())
+        return worker
+
+    @classmethod
+    def run_in_worker(cls, venv_path: str, script: str, input_data: Any = None) -> Tuple[Any, str]:
+        """向常驻worker提交一个任务并等待响应（一次管道写+读）
+
+        同一worker被多个线程共用（_process_step按文件类型并发分发），
+        写请求到读回响应之间持有该worker的锁，保证响应不会串线。
+        """
+        worker = cls.get_or_spawn_worker(venv_path, script)
+        key = (venv_path or "", script)
+        lock = cls._worker_locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                worker.stdin.write(_dumps_bytes(input_data) + b"\n")
+                worker.stdin.flush()
+                line = worker.stdout.readline()
+        except OSError as e:
+            cls._workers.pop(key, None)
+            return None, f"worker通信失败: {str(e)}, 脚本: {script}"
+        if not line:
+            cls._workers.pop(key, None)
+            return None, f"worker异常退出: 退出码 {worker.poll()}, 脚本: {script}"
+        resp = _loads(line)
+        return resp.get("result"), resp.get("error")
+
+    @classmethod
+    def get_or_spawn_shell(cls, venv_path: str) -> subprocess.Popen:
+        """获取（必要时启动）指定venv的常驻shell
+
+        conda activate本身要fork多个进程、source好几个脚本，单次就要
+        200-500ms；常驻shell在启动时激活一次，之后的命令经stdin提交，
+        激活成本整个进程生命周期只付一次。
+        """
+        key = (venv_path or "", threading.get_ident())
+        shell = cls._shells.get(key)
+        if shell is not None and shell.poll() is None:
+            return shell
+
+        shell = subprocess.Popen(
+            ['bash'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # 合流，按哨兵行切分输出
+            text=True
+        )
+        activate_cmd = cls.get_activate_command(venv_path)
+        if activate_cmd:
+            shell.stdin.write(activate_cmd.rstrip('&').rstrip() + "\n")
+            shell.stdin.flush()
+        cls._shells[key] = shell
+        return shell
+
+    @classmethod
+    def run_in_shell(cls, venv_path: str, command_str: str) -> Tuple[int, str]:
+        """在常驻shell里执行一条命令，返回(退出码, 合并输出)
+
+        命令后追加一行echo哨兵+退出码，读到哨兵即知命令结束，无需等待
+        shell退出；shell死掉时从缓存剔除，下次调用自动重启。
+
+        哨兵协议依赖POSIX的$?，Windows上cmd.exe没有对应语义，直接退回
+        一次性subprocess.run（激活成本回到每调用一次，但行为正确）。
+        """
+        if os.name == 'nt':
+            activate_cmd = cls.get_activate_command(venv_path)
+            full_command = f"{activate_cmd} {command_str}" if activate_cmd else command_str
+            result = subprocess.run(full_command, shell=True, capture_output=True, text=True)
+            return result.returncode, result.stdout + result.stderr
+
+        shell = cls.get_or_spawn_shell(venv_path)
+        try:
+            shell.stdin.write(f"{command_str}\necho {cls._SHELL_SENTINEL} $?\n")
+            shell.stdin.flush()
+            output_lines = []
+            for line in shell.stdout:
+                if line.startswith(cls._SHELL_SENTINEL):
+                    returncode = int(line.split()[1])
+                    return returncode, ''.join(output_lines)
+                output_lines.append(line)
+        except (OSError, ValueError, IndexError):
+            pass
+        cls._shells.pop((venv_path or "", threading.get_ident()), None)
+        return -1, f"常驻shell异常退出: {shell.poll()}"
+
+    @classmethod
+    def shutdown_workers(cls) -> None:
+        """关闭所有常驻worker/shell（关stdin让其自然退出，超时则terminate）"""
+        for worker in list(cls._workers.values()) + list(cls._shells.values()):
+            if worker.poll() is not None:
+                continue
+            try:
+                worker.stdin.close()
+                worker.wait(timeout=5)
+            except Exception:
+                worker.terminate()
+        cls._workers.clear()
+        cls._shells.clear()
+
     @staticmethod
+    @functools.lru_cache(maxsize=32)
     def get_activate_command(venv_path: str) -> str:
-        """获取激活虚拟环境的命令字符串，支持conda环境和普通virtualenv"""
+        """获取激活虚拟环境的命令字符串，支持conda环境和普通virtualenv
+
+        按venv_path缓存：同一环境反复调用时不再每次stat探测conda-meta
+        和重拼命令串。环境目录在进程运行中途被删的情况不在考虑范围。
+        """
         if not venv_path or not os.path.exists(venv_path):
-            return []
+            return ""  # 返回空串：调用方的 if activate_cmd 分支可直接短路
         
         # 检测是否为conda环境
         is_conda_env = os.path.exists(os.path.join(venv_path, 'conda-meta'))
@@ -34,51 +209,132 @@ class EnvironmentManager:
 
     @staticmethod
     def run_in_environment(venv_path: str, command: List[str], input_data: Any = None) -> Tuple[Any, str]:
-        """正确执行命令字符串，确保通过shell解析"""
-        activate_cmd = EnvironmentManager.get_activate_command(venv_path)
-        print("activate_cmd: ", activate_cmd)
-        
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
-            json.dump(input_data, f)
+        """在常驻shell中执行命令（激活成本只在shell首次启动时付一次）"""
+        # 创建临时文件（orjson可用时走C实现序列化）。先序列化拿到长度，
+        # 写入前posix_fallocate一次性预留extent，大输入不再边写边扩
+        data = _dumps_bytes(input_data)
+        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.json') as f:
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, len(data))
+                except OSError:
+                    pass  # 文件系统不支持时直接顺序写
+            f.write(data)
             input_file = f.name
-        
+
         tmp = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
         output_file = tmp.name
-        
+
         try:
-            # 构建命令部分
+            # 构建命令部分：shlex.join按shell规则引用每个参数，带空格的
+            # 路径不再炸开；原先的生成器给每个已是str的part白付一次__format__
             command_parts = command + [input_file, output_file]
-            command_str = ' '.join(f'{part}' for part in command_parts)
-            print("command_str: ", command_str)
-            
-            # 组合完整命令
-            full_command = f"{activate_cmd} {command_str}" if activate_cmd else command_str
-            # print(f"执行命令: {full_command}")  # 调试用
-            
-            # 关键修复：正确配置subprocess参数
-            result = subprocess.run(
-                full_command,
-                shell=True,  # 必须设为True，让shell解析命令
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
+            command_str = (subprocess.list2cmdline(command_parts) if os.name == 'nt'
+                           else shlex.join(command_parts))
+            logger.debug("command_str: %s", command_str)
+
+            # 提交到对应venv的常驻shell，不再每次激活环境
+            returncode, shell_output = EnvironmentManager.run_in_shell(venv_path, command_str)
+            if returncode != 0:
+                return None, f"命令执行失败: 退出码 {returncode}, 错误: {shell_output}, 命令: {command_str}"
+
             # 读取输出结果
-            with open(output_file, 'r') as f:
-                output_data = json.load(f)
+            with open(output_file, 'rb') as f:
+                output_data = _loads(f.read())
 
-            print(f"subprocess_result: {output_data}")
+            # debug级惰性格式化：未开DEBUG时不对整个返回payload做repr
+            logger.debug("subprocess_result: %s", output_data)
             return output_data, None
-            
-        except subprocess.CalledProcessError as e:
-            return None, f"命令执行失败: 退出码 {e.returncode}, 错误: {e.stderr}, 命令: {full_command}"
+
         except Exception as e:
-            return None, f"处理过程出错: {str(e)}, 命令: {full_command}"
+            return None, f"处理过程出错: {str(e)}, 命令: {command_str}"
         finally:
             # 清理临时文件
             if os.path.exists(input_file):
                 os.remove(input_file)
             if os.path.exists(output_file):
                 os.remove(output_file)
+
+    @classmethod
+    def run_many(cls, venv_path: str, commands: List[List[str]],
+                 inputs: List[Any], max_workers: int = 8) -> List[Tuple[Any, str]]:
+        """并行执行一批相互独立的run_in_environment调用
+
+        单个调用的耗时几乎全在子进程等待和文件IO上（期间释放GIL），
+        串行提交等于把这些等待逐个叠加；线程池让激活和等待相互重叠。
+        常驻shell按线程隔离，并发提交不会在同一条管道上交错。
+        结果顺序与输入顺序一致。
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                lambda ci: cls.run_in_environment(venv_path, ci[0], ci[1]),
+                zip(commands, inputs)))
+
+    @staticmethod
+    def run_in_environment_stdio(venv_path: str, command: List[str], input_data: Any = None) -> Tuple[Any, str]:
+        """经stdin/stdout以JSON交换数据，不落临时文件
+
+        适用于脚本协议为 stdin读JSON、stdout写JSON 的外部模块：省掉每次
+        调用的2次文件创建+2次unlink和相应的元数据写盘，数据走管道只有
+        memcpy。需要argv临时文件协议的旧脚本仍走run_in_environment。
+        """
+        activate_cmd = EnvironmentManager.get_activate_command(venv_path)
+        # 与run_in_environment同一套引用规则，带空格/元字符的参数不会炸开
+        command_str = (subprocess.list2cmdline(command) if os.name == 'nt'
+                       else shlex.join(command))
+        full_command = f"{activate_cmd} {command_str}" if activate_cmd else command_str
+
+        try:
+            # bytes模式：stdout不做整体UTF-8解码（orjson/json都直接吃bytes），
+            # 只在出错时才解码stderr拼错误信息
+            result = subprocess.run(
+                full_command,
+                shell=True,
+                input=_dumps_bytes(input_data),
+                capture_output=True,
+                check=True
+            )
+            return _loads(result.stdout), None
+        except subprocess.CalledProcessError as e:
+            stderr = e.stderr.decode(errors='replace') if e.stderr else ''
+            return None, f"命令执行失败: 退出码 {e.returncode}, 错误: {stderr}, 命令: {full_command}"
+        except Exception as e:
+            return None, f"处理过程出错: {str(e)}, 命令: {full_command}"
+
+    @staticmethod
+    def run_in_environment_piped(venv_path: str, command: List[str], input_data: Any = None) -> Tuple[Any, str]:
+        """通过stdin/stdout管道以二进制帧传输输入输出，不落临时文件
+
+        适用于脚本协议支持帧格式（utils.ipc）的外部模块：整个负载经pickle
+        protocol 5流式通过管道，大对象不再经历JSON编码和文件系统往返。
+        """
+        from utils.ipc import write_frame, read_frame
+
+        activate_cmd = EnvironmentManager.get_activate_command(venv_path)
+        command_str = ' '.join(command)
+        full_command = f"{activate_cmd} {command_str}" if activate_cmd else command_str
+
+        proc = None
+        try:
+            proc = subprocess.Popen(
+                full_command,
+                shell=True,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            write_frame(proc.stdin, input_data)
+            proc.stdin.close()
+            output_data = read_frame(proc.stdout)
+            proc.wait()
+            if proc.returncode != 0:
+                stderr = proc.stderr.read().decode(errors='replace')
+                return None, f"命令执行失败: 退出码 {proc.returncode}, 错误: {stderr}, 命令: {full_command}"
+            return output_data, None
+        except Exception as e:
+            if proc is not None:
+                proc.kill()
+            return None, f"处理过程出错: {str(e)}, 命令: {full_command}"
+
+
+atexit.register(EnvironmentManager.shutdown_workers)
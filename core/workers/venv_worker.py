@@ -0,0 +1,34 @@
+"""通用常驻worker：在目标虚拟环境里加载外部模块脚本一次，循环处理任务
+
+用法: python venv_worker.py <module_script>
+
+模块脚本需暴露process(**kwargs)函数。worker按行读取JSON任务、按行写回
+{"result": ..., "error": ...}响应；解释器启动和重依赖（cv2/torch等）的
+导入成本只在首次加载时付一次，之后每个任务只剩一次管道往返。
+"""
+import sys
+import json
+import traceback
+import importlib.util
+
+
+def main() -> None:
+    spec = importlib.util.spec_from_file_location("external_module", sys.argv[1])
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            resp = {"result": mod.process(**job), "error": None}
+        except Exception as e:
+            resp = {"result": None, "error": "%s\n%s" % (str(e), traceback.format_exc())}
+        sys.stdout.write(json.dumps(resp, default=str) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()